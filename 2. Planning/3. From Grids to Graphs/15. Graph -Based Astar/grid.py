@@ -1,8 +1,24 @@
 import numpy as np
 from scipy.spatial import Voronoi
-from bresenham import bresenham
 
 
+def obstacle_mask(shape, north_lo, north_hi, east_lo, east_hi):
+    """
+    Returns a boolean mask of the given shape marking every cell that is
+    covered by at least one of the inclusive index boxes
+    `[north_lo, north_hi] x [east_lo, east_hi]`.
+
+    Instead of slicing each box into the grid, the four corners of all
+    boxes are scattered into a difference array at once; its 2D prefix
+    sum counts the boxes covering each cell.
+    """
+    corners = np.zeros((shape[0] + 1, shape[1] + 1), dtype=np.int64)
+    np.add.at(corners, (north_lo, east_lo), 1)
+    np.add.at(corners, (north_lo, east_hi + 1), -1)
+    np.add.at(corners, (north_hi + 1, east_lo), -1)
+    np.add.at(corners, (north_hi + 1, east_hi + 1), 1)
+    return corners.cumsum(axis=0).cumsum(axis=1)[:-1, :-1] > 0
+
 
 def create_grid(data, drone_altitude, safety_distance):
     """
@@ -28,16 +44,15 @@ def create_grid(data, drone_altitude, safety_distance):
     grid = np.zeros((north_size, east_size))
 
     # Populate the grid with obstacles
-    for i in range(data.shape[0]):
-        north, east, alt, d_north, d_east, d_alt = data[i, :]
-        if alt + d_alt + safety_distance > drone_altitude:
-            obstacle = [
-                int(np.clip(north - d_north - safety_distance - north_min, 0, north_size-1)),
-                int(np.clip(north + d_north + safety_distance - north_min, 0, north_size-1)),
-                int(np.clip(east - d_east - safety_distance - east_min, 0, east_size-1)),
-                int(np.clip(east + d_east + safety_distance - east_min, 0, east_size-1)),
-            ]
-            grid[obstacle[0]:obstacle[1]+1, obstacle[2]:obstacle[3]+1] = 1
+    obstacles = data[data[:, 2] + data[:, 5] + safety_distance > drone_altitude]
+    north, east, alt, d_north, d_east, d_alt = obstacles.T
+    grid[obstacle_mask(
+        grid.shape,
+        np.clip(north - d_north - safety_distance - north_min, 0, north_size-1).astype(int),
+        np.clip(north + d_north + safety_distance - north_min, 0, north_size-1).astype(int),
+        np.clip(east - d_east - safety_distance - east_min, 0, east_size-1).astype(int),
+        np.clip(east + d_east + safety_distance - east_min, 0, east_size-1).astype(int),
+    )] = 1
 
     return grid
 
@@ -62,52 +77,129 @@ def create_grid_and_edges(data, drone_altitude, safety_distance):
 
     # Initialize an empty grid
     grid = np.zeros((north_size, east_size))
-    # Initialize an empty list for Voronoi points
-    points = []
     # Populate the grid with obstacles
-    for i in range(data.shape[0]):
-        north, east, alt, d_north, d_east, d_alt = data[i, :]
-        if alt + d_alt + safety_distance > drone_altitude:
-            obstacle = [
-                int(np.clip(north - d_north - safety_distance - north_min, 0, north_size-1)),
-                int(np.clip(north + d_north + safety_distance - north_min, 0, north_size-1)),
-                int(np.clip(east - d_east - safety_distance - east_min, 0, east_size-1)),
-                int(np.clip(east + d_east + safety_distance - east_min, 0, east_size-1)),
-            ]
-            grid[obstacle[0]:obstacle[1]+1, obstacle[2]:obstacle[3]+1] = 1
-
-            # add center of obstacles to points list
-            points.append([north - north_min, east - east_min])
+    obstacles = data[data[:, 2] + data[:, 5] + safety_distance > drone_altitude]
+    north, east, alt, d_north, d_east, d_alt = obstacles.T
+    grid[obstacle_mask(
+        grid.shape,
+        np.clip(north - d_north - safety_distance - north_min, 0, north_size-1).astype(int),
+        np.clip(north + d_north + safety_distance - north_min, 0, north_size-1).astype(int),
+        np.clip(east - d_east - safety_distance - east_min, 0, east_size-1).astype(int),
+        np.clip(east + d_east + safety_distance - east_min, 0, east_size-1).astype(int),
+    )] = 1
+
+    # add center of obstacles to points list
+    points = np.column_stack((north - north_min, east - east_min))
 
     # TODO: create a voronoi graph based on
     # location of obstacle centres
     graph = Voronoi(points)
 
     # TODO: check each edge from graph.ridge_vertices for collision
-    edges = []
-    for v in graph.ridge_vertices:
-        p1 = graph.vertices[v[0]]
-        p2 = graph.vertices[v[1]]
-        
-        cells = list(bresenham(int(p1[0]), int(p1[1]), int(p2[0]), int(p2[1])))
-        hit = False
-
-        for c in cells:
-            # First check if we're off the map
-            if np.amin(c) < 0 or c[0] >= grid.shape[0] or c[1] >= grid.shape[1]:
-                hit = True
-                break
-            # Next check if we're in collision
-            if grid[c[0], c[1]] == 1:
-                hit = True
-                break
-
-        # If the edge does not hit on obstacle
-        # add it to the list
-        if not hit:
-            # array to tuple for future graph creation step)
-            p1 = (p1[0], p1[1])
-            p2 = (p2[0], p2[1])
-            edges.append((p1, p2))
-
-    return grid, edges
\ No newline at end of file
+    # Ridges that extend to infinity are marked with a -1 vertex index.
+    ridges = np.array(graph.ridge_vertices)
+    ridges = ridges[np.all(ridges >= 0, axis=1)]
+    p1 = graph.vertices[ridges[:, 0]]
+    p2 = graph.vertices[ridges[:, 1]]
+    free = free_segments(grid, p1, p2)
+
+    # If the edge does not hit on obstacle
+    # add it to the list
+    # (array to tuple for future graph creation step)
+    edges = [((a[0], a[1]), (b[0], b[1])) for a, b in zip(p1[free], p2[free])]
+
+    return grid, edges
+
+
+def free_segments(grid, p1, p2, supercover=False):
+    """
+    Returns a boolean mask of the segments `p1[i] -> p2[i]` that stay on
+    the grid and do not hit an obstacle.
+
+    Segments with an end point outside of the grid are rejected up front.
+    By default all remaining segments are rasterized at once into exactly
+    the cells `bresenham` yields for the truncated end points. With
+    `supercover` set, the float end points are used instead and every
+    cell the continuous segment passes through is checked; cells that
+    are only touched at a corner are not.
+    """
+    p1 = np.asarray(p1, dtype=np.float64).reshape(-1, 2)
+    p2 = np.asarray(p2, dtype=np.float64).reshape(-1, 2)
+    shape = np.array(grid.shape[:2])
+    free = np.all((p1 >= 0) & (p1 < shape) & (p2 >= 0) & (p2 < shape), axis=1)
+
+    idx = np.flatnonzero(free)
+    if supercover:
+        free[idx] = ~supercover_hits(grid, p1[idx], p2[idx])
+        return free
+
+    start = p1[idx].astype(int)
+    delta = p2[idx].astype(int) - start
+
+    # Step along the major axis; Bresenham's error term reduces to
+    # rounding the minor coordinate half up.
+    x_major = np.abs(delta[:, 0]) > np.abs(delta[:, 1])
+    major = np.where(x_major, np.abs(delta[:, 0]), np.abs(delta[:, 1]))
+    minor = np.where(x_major, np.abs(delta[:, 1]), np.abs(delta[:, 0]))
+    sign = np.where(delta > 0, 1, -1)
+
+    counts = major + 1
+    seg = np.repeat(np.arange(idx.size), counts)
+    k = np.arange(seg.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    m = minor[seg] * k
+    j = (2 * m + major[seg]) // np.maximum(2 * major[seg], 1)
+
+    # every cell lies within the bounding box of its segment's end
+    # points, so no further bounds checks are needed
+    def cells(k, j):
+        along_x = x_major[seg]
+        dn = np.where(along_x, k, j) * sign[seg, 0]
+        de = np.where(along_x, j, k) * sign[seg, 1]
+        return start[seg, 0] + dn, start[seg, 1] + de
+
+    blocked = grid[cells(k, j)] == 1
+    free[idx] = np.bincount(seg, weights=blocked, minlength=idx.size) == 0
+    return free
+
+
+def supercover_hits(grid, p1, p2):
+    """
+    Returns a boolean mask of the segments `p1[i] -> p2[i]`, which must
+    lie on the grid, that pass through the interior of an obstacle cell.
+
+    Every segment is split at all crossings of the cell boundaries and
+    the cell under the middle of each piece is checked, for all
+    segments at once.
+    """
+    n = len(p1)
+    delta = p2 - p1
+    lo = np.floor(np.minimum(p1, p2))
+    crossings = (np.floor(np.maximum(p1, p2)) - lo).astype(int)
+
+    # parameters t in [0, 1] of the segment start, end and every crossing
+    segs = [np.arange(n), np.arange(n)]
+    ts = [np.zeros(n), np.ones(n)]
+    for axis in range(2):
+        counts = crossings[:, axis]
+        seg = np.repeat(np.arange(n), counts)
+        k = np.arange(seg.size) - np.repeat(np.cumsum(counts) - counts, counts)
+        segs.append(seg)
+        ts.append((lo[seg, axis] + 1 + k - p1[seg, axis]) / delta[seg, axis])
+    seg = np.concatenate(segs)
+    t = np.concatenate(ts)
+    order = np.lexsort((t, seg))
+    seg, t = seg[order], t[order]
+
+    # the middle of every piece of non-zero length between two crossings
+    piece = (seg[1:] == seg[:-1]) & (t[1:] > t[:-1])
+    seg = seg[:-1][piece]
+    t = ((t[:-1] + t[1:]) / 2)[piece]
+    cells = np.floor(p1[seg] + t[:, np.newaxis] * delta[seg]).astype(int)
+    cells = np.minimum(cells, np.array(grid.shape[:2]) - 1)
+    blocked = grid[cells[:, 0], cells[:, 1]] == 1
+    # a segment without any piece is a single point
+    hits = np.bincount(seg, weights=blocked, minlength=n) > 0
+    single = np.bincount(seg, minlength=n) == 0
+    point = np.floor(p1[single]).astype(int)
+    hits[single] = grid[point[:, 0], point[:, 1]] == 1
+    return hits
@@ -0,0 +1,357 @@
+import hashlib
+import heapq
+import os
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from planning import Action
+
+
+class HierarchicalPlanner:
+    """
+    Hierarchical path-finding (HPA*) over the 8-connected `Action` grid.
+
+    The grid is partitioned into square clusters. Where two clusters
+    share a run of free border cells, transitions are placed at the
+    middle of the run (or at both ends of long runs), and the costs of
+    the shortest paths between the transition cells of a cluster are
+    precomputed. Queries are answered on this abstract graph and only
+    the clusters on the resulting route are refined into grid cells.
+    Paths are not guaranteed to be optimal: they are usually within a
+    few percent of the optimum, but short paths that have to detour
+    through a transition can be several times longer.
+    """
+
+    def __init__(self, grid, cluster_size=32):
+        self._free = np.asarray(grid) != 1
+        self._cluster_size = cluster_size
+        n, m = self._free.shape
+        self._clusters = (-(-n // cluster_size), -(-m // cluster_size))
+        self._straight_cost = min(a.cost for a in Action if 0 in a.delta)
+        self._diagonal_cost = min(a.cost for a in Action if 0 not in a.delta)
+
+        # transitions per border and abstract edges per cluster
+        self._transitions = {border: self.border_transitions(border) for border in self.borders()}
+        self._cluster_nodes = self.collect_cluster_nodes()
+        self._intra = {cluster: self.intra_edges(cluster) for cluster in self.clusters()}
+        self._graph = self.abstract_graph()
+
+    @property
+    def shape(self):
+        return self._free.shape
+
+    @property
+    def cluster_size(self):
+        return self._cluster_size
+
+    def clusters(self):
+        return [(ci, cj) for ci in range(self._clusters[0]) for cj in range(self._clusters[1])]
+
+    def borders(self):
+        """
+        Borders are keyed by `('v', ci, cj)` between cluster `(ci, cj)` and
+        the cluster east of it, and `('h', ci, cj)` for the one south of it.
+        """
+        nci, ncj = self._clusters
+        return [('v', ci, cj) for ci in range(nci) for cj in range(ncj - 1)] + \
+               [('h', ci, cj) for ci in range(nci - 1) for cj in range(ncj)]
+
+    def cluster_of(self, cell):
+        return (cell[0] // self._cluster_size, cell[1] // self._cluster_size)
+
+    def bounds(self, cluster):
+        """Returns the `(row_lo, row_hi, col_lo, col_hi)` cell range of a cluster."""
+        c = self._cluster_size
+        n, m = self._free.shape
+        return cluster[0] * c, min((cluster[0] + 1) * c, n), cluster[1] * c, min((cluster[1] + 1) * c, m)
+
+    def border_transitions(self, border):
+        """
+        Returns the `(cell_a, cell_b, cost)` transitions across a border.
+        """
+        kind, ci, cj = border
+        c = self._cluster_size
+        if kind == 'v':
+            return self.line_transitions(self._free, ci * c, (ci + 1) * c, (cj + 1) * c - 1)
+        # horizontal borders are vertical borders of the transposed grid
+        transposed = self.line_transitions(self._free.T, cj * c, (cj + 1) * c, (ci + 1) * c - 1)
+        return [((a[1], a[0]), (b[1], b[0]), cost) for a, b, cost in transposed]
+
+    def line_transitions(self, free, r0, r1, e):
+        """
+        Transitions between column `e` and `e + 1` of `free` along rows
+        `r0..r1`. Straight transitions are placed per run of free cell
+        pairs; a diagonal move across the border only gets a transition
+        of its own where no straight pair in the same rows allows it.
+        """
+        n = free.shape[0]
+        r1 = min(r1, n)
+        pair = free[r0:r1, e] & free[r0:r1, e + 1]
+        transitions = []
+
+        idx = np.flatnonzero(pair)
+        for run in np.split(idx, np.flatnonzero(np.diff(idx) > 1) + 1):
+            if run.size == 0:
+                continue
+            picks = [run[run.size // 2]] if run.size < 6 else [run[0], run[-1]]
+            for k in picks:
+                r = r0 + int(k)
+                transitions.append(((r, e), (r, e + 1), self._straight_cost))
+
+        for r in range(r0, min(r1, n - 1)):
+            if r + 1 < r1 and (pair[r - r0] or pair[r + 1 - r0]):
+                continue
+            if free[r, e] and free[r + 1, e + 1]:
+                transitions.append(((r, e), (r + 1, e + 1), self._diagonal_cost))
+            if free[r + 1, e] and free[r, e + 1]:
+                transitions.append(((r + 1, e), (r, e + 1), self._diagonal_cost))
+        return transitions
+
+    def collect_cluster_nodes(self):
+        nodes = {}
+        for transitions in self._transitions.values():
+            for a, b, _ in transitions:
+                nodes.setdefault(self.cluster_of(a), set()).add(a)
+                nodes.setdefault(self.cluster_of(b), set()).add(b)
+        return {cluster: sorted(cells) for cluster, cells in nodes.items()}
+
+    def cluster_graph(self, cluster):
+        """
+        Returns the sparse graph of the moves that stay within a cluster,
+        with cells numbered row by row inside the cluster.
+        """
+        r0, r1, c0, c1 = self.bounds(cluster)
+        sub = self._free[r0:r1, c0:c1]
+        h, w = sub.shape
+        ids = np.arange(h * w).reshape(h, w)
+        rows, cols, costs = [], [], []
+        for action in Action:
+            dx, dy = action.delta
+            src = (slice(max(0, -dx), h - max(0, dx)), slice(max(0, -dy), w - max(0, dy)))
+            dst = (slice(max(0, dx), h - max(0, -dx)), slice(max(0, dy), w - max(0, -dy)))
+            valid = sub[src] & sub[dst]
+            rows.append(ids[src][valid])
+            cols.append(ids[dst][valid])
+            costs.append(np.full(valid.sum(), float(action.cost)))
+        graph = csr_matrix((np.concatenate(costs), (np.concatenate(rows), np.concatenate(cols))), shape=(h * w, h * w))
+        return graph, (r0, c0, w)
+
+    def cluster_search(self, cluster, sources):
+        """
+        Runs Dijkstra within a cluster from each of the source cells.
+        Returns the cost and predecessor arrays along with a function
+        mapping cells to their local index.
+        """
+        graph, (r0, c0, w) = self.cluster_graph(cluster)
+        local = lambda cell: (cell[0] - r0) * w + (cell[1] - c0)
+        dist, pred = dijkstra(graph, directed=True, indices=[local(s) for s in sources], return_predecessors=True)
+        return dist, pred, local, (r0, c0, w)
+
+    def intra_edges(self, cluster):
+        """
+        Returns `{(a, b): cost}` for all pairs of transition cells of a
+        cluster that are connected within it.
+        """
+        nodes = self._cluster_nodes.get(cluster, [])
+        if len(nodes) < 2:
+            return {}
+        dist, _, local, _ = self.cluster_search(cluster, nodes)
+        targets = [local(b) for b in nodes]
+        edges = {}
+        for i, a in enumerate(nodes):
+            for j, b in enumerate(nodes):
+                if i != j and np.isfinite(dist[i, targets[j]]):
+                    edges[(a, b)] = float(dist[i, targets[j]])
+        return edges
+
+    def abstract_graph(self):
+        graph = {}
+        for edges in self._intra.values():
+            for (a, b), cost in edges.items():
+                graph.setdefault(a, {})[b] = cost
+        for transitions in self._transitions.values():
+            for a, b, cost in transitions:
+                graph.setdefault(a, {})[b] = cost
+                graph.setdefault(b, {})[a] = cost
+        return graph
+
+    def update(self, grid):
+        """
+        Updates the abstraction for a changed grid, rebuilding only the
+        clusters in which cells changed, the borders around them and the
+        abstract edges of their neighbours.
+        """
+        free = np.asarray(grid) != 1
+        changed = np.argwhere(free != self._free)
+        self._free = free
+        if changed.size == 0:
+            return
+
+        affected = {tuple(c) for c in np.unique(changed // self._cluster_size, axis=0).tolist()}
+        borders = [b for b in self.borders()
+                   if any((b[1] + di, b[2] + dj) in affected for di in (0, 1) for dj in (0, 1))]
+        for border in borders:
+            self._transitions[border] = self.border_transitions(border)
+
+        self._cluster_nodes = self.collect_cluster_nodes()
+        rebuild = {(ci + di, cj + dj) for ci, cj in affected for di in (-1, 0, 1) for dj in (-1, 0, 1)}
+        for cluster in rebuild & set(self._intra):
+            self._intra[cluster] = self.intra_edges(cluster)
+        self._graph = self.abstract_graph()
+
+    def heuristic(self, a, b):
+        # octile distance
+        dx, dy = abs(a[0] - b[0]), abs(a[1] - b[1])
+        return self._straight_cost * abs(dx - dy) + self._diagonal_cost * min(dx, dy)
+
+    def link(self, cell):
+        """
+        Returns the costs from a cell to the transition cells of its cluster.
+        """
+        cluster = self.cluster_of(cell)
+        nodes = self._cluster_nodes.get(cluster, [])
+        if not nodes:
+            return {}
+        dist, _, local, _ = self.cluster_search(cluster, [cell])
+        return {b: float(dist[0, local(b)]) for b in nodes if np.isfinite(dist[0, local(b)])}
+
+    def refine(self, a, b):
+        """
+        Returns the cells of the shortest path from `a` to `b`, excluding
+        `a`, within their common cluster.
+        """
+        cluster = self.cluster_of(a)
+        _, pred, local, (r0, c0, w) = self.cluster_search(cluster, [a])
+        cells = []
+        i = local(b)
+        while i != local(a):
+            cells.append((r0 + i // w, c0 + i % w))
+            i = pred[0, i]
+        return cells[::-1]
+
+    def plan(self, start, goal):
+        """
+        Returns a `(path, cost)` tuple like `a_star`.
+        """
+        start = (int(start[0]), int(start[1]))
+        goal = (int(goal[0]), int(goal[1]))
+
+        # temporary edges from the start and into the goal
+        start_links = self.link(start) if self._free[start] else {}
+        goal_links = self.link(goal) if self._free[goal] else {}
+        if self._free[start] and self._free[goal] and self.cluster_of(start) == self.cluster_of(goal):
+            dist, _, local, _ = self.cluster_search(self.cluster_of(start), [start])
+            if np.isfinite(dist[0, local(goal)]):
+                start_links[goal] = float(dist[0, local(goal)])
+
+        def neighbours(node):
+            edges = dict(self._graph.get(node, {}))
+            if node == start:
+                # the start may itself be a transition cell
+                edges.update(start_links)
+            if node in goal_links:
+                edges[goal] = min(edges.get(goal, np.inf), goal_links[node])
+            return edges.items()
+
+        queue = [(self.heuristic(start, goal), start)]
+        branch = {start: (0.0, None)}
+        closed = set()
+        found = start == goal
+        while queue and not found:
+            _, current = heapq.heappop(queue)
+            if current in closed:
+                continue
+            if current == goal:
+                found = True
+                break
+            closed.add(current)
+            current_cost = branch[current][0]
+            for next_node, cost in neighbours(current):
+                branch_cost = current_cost + cost
+                if next_node not in closed and (next_node not in branch or branch_cost < branch[next_node][0]):
+                    branch[next_node] = (branch_cost, current)
+                    heapq.heappush(queue, (branch_cost + self.heuristic(next_node, goal), next_node))
+
+        if not found:
+            print('**********************')
+            print('Failed to find a path!')
+            print('**********************')
+            return [], 0
+
+        print('Found a path.')
+        route = []
+        n = goal
+        while n is not None:
+            route.append(n)
+            n = branch[n][1]
+        route = route[::-1]
+
+        # refine the abstract route cluster by cluster
+        path = [start]
+        for a, b in zip(route[:-1], route[1:]):
+            if self.cluster_of(a) == self.cluster_of(b):
+                path.extend(self.refine(a, b))
+            else:
+                path.append(b)
+        return path, branch[goal][0]
+
+    def save(self, filename):
+        """
+        Stores the precomputed abstraction in an `.npz` file.
+        """
+        kinds = {'v': 0, 'h': 1}
+        transitions = [(kinds[k], ci, cj, a[0], a[1], b[0], b[1], cost)
+                       for (k, ci, cj), ts in self._transitions.items() for a, b, cost in ts]
+        intra = [(ci, cj, a[0], a[1], b[0], b[1], cost)
+                 for (ci, cj), edges in self._intra.items() for (a, b), cost in edges.items()]
+        np.savez_compressed(
+            filename,
+            free=np.packbits(self._free), shape=self._free.shape, cluster_size=self._cluster_size,
+            transitions=np.array(transitions, dtype=np.float64).reshape(-1, 8),
+            intra=np.array(intra, dtype=np.float64).reshape(-1, 7))
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Loads an abstraction stored with `save`.
+        """
+        planner = cls.__new__(cls)
+        with np.load(filename) as f:
+            shape = tuple(f['shape'])
+            planner._free = np.unpackbits(f['free'], count=shape[0] * shape[1]).reshape(shape).astype(bool)
+            planner._cluster_size = int(f['cluster_size'])
+            transitions, intra = f['transitions'], f['intra']
+
+        c = planner._cluster_size
+        planner._clusters = (-(-shape[0] // c), -(-shape[1] // c))
+        planner._straight_cost = min(a.cost for a in Action if 0 in a.delta)
+        planner._diagonal_cost = min(a.cost for a in Action if 0 not in a.delta)
+        planner._transitions = {border: [] for border in planner.borders()}
+        for kind, ci, cj, ar, ac, br, bc, cost in transitions.tolist():
+            border = ('vh'[int(kind)], int(ci), int(cj))
+            planner._transitions[border].append(((int(ar), int(ac)), (int(br), int(bc)), cost))
+        planner._intra = {cluster: {} for cluster in planner.clusters()}
+        for ci, cj, ar, ac, br, bc, cost in intra.tolist():
+            planner._intra[(int(ci), int(cj))][((int(ar), int(ac)), (int(br), int(bc)))] = cost
+        planner._cluster_nodes = planner.collect_cluster_nodes()
+        planner._graph = planner.abstract_graph()
+        return planner
+
+    @classmethod
+    def cached(cls, grid, drone_altitude, safety_distance, cluster_size=32, cache_dir='.cache'):
+        """
+        Returns the planner for a grid, loading the abstraction from
+        `cache_dir` if it was built before for the same grid,
+        `(drone_altitude, safety_distance)` and cluster size.
+        """
+        free = np.asarray(grid) != 1
+        digest = hashlib.sha1(np.packbits(free).tobytes() + str(free.shape).encode()).hexdigest()[:16]
+        filename = os.path.join(cache_dir, 'hpa-{!r}-{!r}-{}-{}.npz'.format(
+            float(drone_altitude), float(safety_distance), cluster_size, digest))
+        if os.path.exists(filename):
+            return cls.load(filename)
+        planner = cls(grid, cluster_size)
+        os.makedirs(cache_dir, exist_ok=True)
+        planner.save(filename)
+        return planner
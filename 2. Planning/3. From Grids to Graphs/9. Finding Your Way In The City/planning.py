@@ -1,5 +1,9 @@
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
+from multiprocessing import shared_memory
 from queue import PriorityQueue
+import heapq
+import numpy as np
 
 
 class Action(Enum):
@@ -221,3 +225,475 @@ def a_star_penalized(grid, h, start, goal, direction_change_cost):
         print('**********************') 
     return path[::-1], path_cost
 
+
+def action_table(width):
+    """
+    Returns the flat index offsets and costs of all actions
+    on a row-major grid of the given width.
+    """
+    offsets = np.array([a.delta[0] * width + a.delta[1] for a in Action], dtype=np.int64)
+    costs = np.array([a.cost for a in Action], dtype=np.float64)
+    return offsets, costs
+
+
+def a_star_array(grid, h, start, goal):
+    """
+    Array-backed variant of `a_star_regular`.
+
+    Cells are addressed by their flat index into a copy of the grid
+    that is padded with a one cell obstacle border, so neighbours never
+    need a bounds check. Costs, parents and closed flags live in flat
+    arrays and the open list is a `heapq` of (priority, cell id) pairs.
+    Returns the same `(path, cost)` tuple as `a_star`.
+    """
+
+    # Pad the grid with obstacles so that every neighbour
+    # of a free cell is a valid index.
+    width = grid.shape[1] + 2
+    blocked = np.ones((grid.shape[0] + 2, width), dtype=np.bool_)
+    blocked[1:-1, 1:-1] = grid == 1
+    blocked = blocked.ravel()
+
+    offsets, costs = action_table(width)
+    actions = list(zip(offsets.tolist(), costs.tolist()))
+
+    g = np.full(blocked.size, np.inf)
+    parent = np.full(blocked.size, -1, dtype=np.int64)
+    closed = np.zeros(blocked.size, dtype=np.bool_)
+
+    def to_id(node):
+        return (int(node[0]) + 1) * width + int(node[1]) + 1
+
+    def to_node(i):
+        return (i // width - 1, i % width - 1)
+
+    start_id = to_id(start)
+    goal_id = to_id(goal)
+    g[start_id] = 0.0
+
+    queue = [(0.0, start_id)]
+    found = False
+
+    while queue:
+        _, current = heapq.heappop(queue)
+        if closed[current]:
+            continue
+        if current == goal_id:
+            print('Found a path.')
+            found = True
+            break
+
+        closed[current] = True
+        current_cost = g[current]
+        for offset, cost in actions:
+            next_id = current + offset
+            if blocked[next_id] or closed[next_id]:
+                continue
+            branch_cost = current_cost + cost
+            if branch_cost < g[next_id]:
+                g[next_id] = branch_cost
+                parent[next_id] = current
+                queue_cost = branch_cost + h(to_node(next_id), goal)
+                heapq.heappush(queue, (queue_cost, next_id))
+
+    path = []
+    path_cost = 0
+    if found:
+        # retrace steps
+        path_cost = float(g[goal_id])
+        n = goal_id
+        while n != start_id:
+            path.append(to_node(n))
+            n = int(parent[n])
+        path.append(to_node(start_id))
+    else:
+        print('**********************')
+        print('Failed to find a path!')
+        print('**********************')
+    return path[::-1], path_cost
+
+
+def jps(grid, start, goal, jump_points_only=False):
+    """
+    Jump Point Search over the 8-connected grid of `Action`.
+
+    Straight and diagonal moves are costed like the corresponding
+    actions and, as in `valid_actions`, a diagonal move only requires
+    the target cell to be free. The search only expands jump points,
+    so the returned cost is the same as that of an optimal A* search.
+
+    If `jump_points_only` is set, only the jump points are returned,
+    which is already a pruned path; otherwise the straight segments
+    between them are filled in cell by cell.
+    """
+
+    straight_cost = min(a.cost for a in Action if 0 in a.delta)
+    diagonal_cost = min(a.cost for a in Action if 0 not in a.delta)
+    n, m = grid.shape
+    start = (int(start[0]), int(start[1]))
+    goal = (int(goal[0]), int(goal[1]))
+
+    # Nested lists are much cheaper to index cell by cell than the array.
+    blocked = (grid == 1).tolist()
+
+    def free(x, y):
+        return 0 <= x < n and 0 <= y < m and not blocked[x][y]
+
+    def h(x, y):
+        # octile distance
+        dx, dy = abs(x - goal[0]), abs(y - goal[1])
+        return straight_cost * abs(dx - dy) + diagonal_cost * min(dx, dy)
+
+    def jump_straight(x, y, dx, dy):
+        while True:
+            x += dx
+            y += dy
+            if not free(x, y):
+                return None
+            if (x, y) == goal:
+                return x, y
+            if dx != 0:
+                if (not free(x, y - 1) and free(x + dx, y - 1)) or \
+                        (not free(x, y + 1) and free(x + dx, y + 1)):
+                    return x, y
+            else:
+                if (not free(x - 1, y) and free(x - 1, y + dy)) or \
+                        (not free(x + 1, y) and free(x + 1, y + dy)):
+                    return x, y
+
+    def jump_diagonal(x, y, dx, dy):
+        while True:
+            x += dx
+            y += dy
+            if not free(x, y):
+                return None
+            if (x, y) == goal:
+                return x, y
+            if (not free(x - dx, y) and free(x - dx, y + dy)) or \
+                    (not free(x, y - dy) and free(x + dx, y - dy)):
+                return x, y
+            if jump_straight(x, y, dx, 0) is not None or \
+                    jump_straight(x, y, 0, dy) is not None:
+                return x, y
+
+    def directions(node, parent):
+        """Returns the pruned set of directions to search from `node`."""
+        x, y = node
+        if parent is None:
+            return [a.delta for a in Action]
+        dx = (x > parent[0]) - (x < parent[0])
+        dy = (y > parent[1]) - (y < parent[1])
+        if dx != 0 and dy != 0:
+            dirs = [(dx, 0), (0, dy), (dx, dy)]
+            if not free(x - dx, y):
+                dirs.append((-dx, dy))
+            if not free(x, y - dy):
+                dirs.append((dx, -dy))
+        elif dx != 0:
+            dirs = [(dx, 0)]
+            if not free(x, y - 1):
+                dirs.append((dx, -1))
+            if not free(x, y + 1):
+                dirs.append((dx, 1))
+        else:
+            dirs = [(0, dy)]
+            if not free(x - 1, y):
+                dirs.append((-1, dy))
+            if not free(x + 1, y):
+                dirs.append((1, dy))
+        return dirs
+
+    queue = [(h(*start), start)]
+    branch = {start: (0.0, None)}
+    closed = set()
+    found = False
+
+    while queue:
+        _, current_node = heapq.heappop(queue)
+        if current_node in closed:
+            continue
+        if current_node == goal:
+            print('Found a path.')
+            found = True
+            break
+
+        closed.add(current_node)
+        current_cost, parent = branch[current_node]
+        for dx, dy in directions(current_node, parent):
+            if dx != 0 and dy != 0:
+                jump_point = jump_diagonal(current_node[0], current_node[1], dx, dy)
+            else:
+                jump_point = jump_straight(current_node[0], current_node[1], dx, dy)
+            if jump_point is None or jump_point in closed:
+                continue
+
+            steps = max(abs(jump_point[0] - current_node[0]), abs(jump_point[1] - current_node[1]))
+            step_cost = diagonal_cost if dx != 0 and dy != 0 else straight_cost
+            branch_cost = current_cost + steps * step_cost
+            if jump_point not in branch or branch_cost < branch[jump_point][0]:
+                branch[jump_point] = (branch_cost, current_node)
+                heapq.heappush(queue, (branch_cost + h(*jump_point), jump_point))
+
+    path = []
+    path_cost = 0
+    if found:
+        # retrace steps
+        path_cost = branch[goal][0]
+        n = goal
+        while n is not None:
+            path.append(n)
+            n = branch[n][1]
+        path = path[::-1]
+
+        if not jump_points_only:
+            # fill in the cells between consecutive jump points
+            cells = [path[0]]
+            for p1, p2 in zip(path[:-1], path[1:]):
+                dx = (p2[0] > p1[0]) - (p2[0] < p1[0])
+                dy = (p2[1] > p1[1]) - (p2[1] < p1[1])
+                steps = max(abs(p2[0] - p1[0]), abs(p2[1] - p1[1]))
+                cells.extend((p1[0] + k * dx, p1[1] + k * dy) for k in range(1, steps + 1))
+            path = cells
+    else:
+        print('**********************')
+        print('Failed to find a path!')
+        print('**********************')
+    return path, path_cost
+
+
+class GridPlanner:
+    """
+    A* planner bound to one grid, for serving many queries.
+
+    The grid is padded with an obstacle border and, for every cell, the
+    set of valid actions is precomputed as a bit mask. Search state is
+    allocated once and reused across queries: a generation counter
+    tells which entries belong to the current query, so nothing has to
+    be cleared in between.
+    """
+
+    def __init__(self, grid):
+        grid = np.asarray(grid)
+        self._shape = grid.shape
+        self._width = grid.shape[1] + 2
+        blocked = np.ones((grid.shape[0] + 2, self._width), dtype=np.bool_)
+        blocked[1:-1, 1:-1] = grid == 1
+        self._blocked = blocked.ravel()
+
+        offsets, costs = action_table(self._width)
+        self._straight_cost = min(a.cost for a in Action if 0 in a.delta)
+        self._diagonal_cost = min(a.cost for a in Action if 0 not in a.delta)
+
+        # bit i of a cell's mask is set if action i leads to a free cell
+        masks = np.zeros(self._blocked.size, dtype=np.uint8)
+        inner = np.arange(self._blocked.size)[~self._blocked]
+        for i, offset in enumerate(offsets):
+            masks[inner] |= (~self._blocked[inner + offset]).astype(np.uint8) << i
+        self._masks = masks.tolist()
+        self._moves = [
+            [(int(offsets[i]), float(costs[i])) for i in range(len(offsets)) if mask >> i & 1]
+            for mask in range(256)
+        ]
+
+        # Plain lists: the search touches single entries only, which is
+        # considerably cheaper on lists than on NumPy arrays.
+        self._g = [0.0] * self._blocked.size
+        self._parent = [0] * self._blocked.size
+        self._seen = [0] * self._blocked.size
+        self._closed = [0] * self._blocked.size
+        self._generation = 0
+
+    @property
+    def shape(self):
+        return self._shape
+
+    def to_id(self, node):
+        return (int(node[0]) + 1) * self._width + int(node[1]) + 1
+
+    def to_node(self, i):
+        return (i // self._width - 1, i % self._width - 1)
+
+    def plan(self, start, goal, h=None):
+        """
+        Returns the `(path, cost)` of a single query, like `a_star_array`,
+        but without printing. `h(node, goal)` defaults to the octile
+        distance, which is admissible for the `Action` costs.
+        """
+        self._generation += 1
+        generation = self._generation
+        g, parent, seen, closed = self._g, self._parent, self._seen, self._closed
+        masks, moves = self._masks, self._moves
+
+        start_id = self.to_id(start)
+        goal_id = self.to_id(goal)
+        width = self._width
+        goal_x, goal_y = divmod(goal_id, width)
+        straight_cost, diagonal_cost = self._straight_cost, self._diagonal_cost
+
+        g[start_id] = 0.0
+        seen[start_id] = generation
+        queue = [(0.0, start_id)]
+        found = False
+
+        while queue:
+            _, current = heapq.heappop(queue)
+            if closed[current] == generation:
+                continue
+            if current == goal_id:
+                found = True
+                break
+
+            closed[current] = generation
+            current_cost = g[current]
+            for offset, cost in moves[masks[current]]:
+                next_id = current + offset
+                if closed[next_id] == generation:
+                    continue
+                branch_cost = current_cost + cost
+                if seen[next_id] != generation or branch_cost < g[next_id]:
+                    seen[next_id] = generation
+                    g[next_id] = branch_cost
+                    parent[next_id] = current
+                    if h is None:
+                        # octile distance, inlined as this is the hot loop
+                        dx, dy = divmod(next_id, width)
+                        dx = abs(dx - goal_x)
+                        dy = abs(dy - goal_y)
+                        estimate = straight_cost * abs(dx - dy) + diagonal_cost * (dx if dx < dy else dy)
+                    else:
+                        estimate = h(self.to_node(next_id), goal)
+                    heapq.heappush(queue, (branch_cost + estimate, next_id))
+
+        path = []
+        path_cost = 0
+        if found:
+            path_cost = g[goal_id]
+            n = goal_id
+            while n != start_id:
+                path.append(self.to_node(n))
+                n = parent[n]
+            path.append(self.to_node(start_id))
+        return path[::-1], path_cost
+
+    def plan_many(self, queries, processes=None, chunksize=8):
+        """
+        Serves a batch of `(start, goal)` queries and returns their
+        `(path, cost)` results in input order.
+
+        With `processes` set, the queries are distributed over a process
+        pool whose workers map the grid from shared memory instead of
+        receiving a copy each.
+        """
+        queries = [(tuple(start), tuple(goal)) for start, goal in queries]
+        if not processes or processes < 2:
+            return [self.plan(start, goal) for start, goal in queries]
+
+        grid = (self._blocked.reshape(-1, self._width)[1:-1, 1:-1]).astype(np.uint8)
+        shm = shared_memory.SharedMemory(create=True, size=max(grid.nbytes, 1))
+        try:
+            np.ndarray(grid.shape, dtype=np.uint8, buffer=shm.buf)[:] = grid
+            with ProcessPoolExecutor(max_workers=processes, initializer=attach_grid_planner,
+                                     initargs=(shm.name, grid.shape)) as pool:
+                return list(pool.map(plan_query, queries, chunksize=chunksize))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def cost_to_go(self, goal):
+        """
+        Returns the cost of the cheapest path from every cell to `goal` as
+        an array shaped like the grid, with `inf` for cells that cannot
+        reach it, obstacles included.
+
+        This is Dijkstra's algorithm run backwards from the goal. As every
+        action has an opposite action of the same cost, the free
+        neighbours of a cell are exactly the cells that can move into it.
+        """
+        masks, moves = self._masks, self._moves
+        goal_id = self.to_id(goal)
+        field = [np.inf] * self._blocked.size
+        field[goal_id] = 0.0
+        queue = [(0.0, goal_id)]
+
+        while queue:
+            current_cost, current = heapq.heappop(queue)
+            if current_cost > field[current]:
+                continue
+            for offset, cost in moves[masks[current]]:
+                prev_id = current + offset
+                branch_cost = current_cost + cost
+                if branch_cost < field[prev_id]:
+                    field[prev_id] = branch_cost
+                    heapq.heappush(queue, (branch_cost, prev_id))
+
+        field = np.array(field).reshape(-1, self._width)[1:-1, 1:-1]
+        return np.ascontiguousarray(field)
+
+
+# The planner of a worker process in `GridPlanner.plan_many`.
+worker_planner = None
+
+
+def attach_grid_planner(name, shape):
+    """
+    Process pool initializer: builds the worker's planner from the grid
+    in shared memory.
+    """
+    global worker_planner
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        worker_planner = GridPlanner(np.ndarray(shape, dtype=np.uint8, buffer=shm.buf))
+    finally:
+        shm.close()
+
+
+def plan_query(query):
+    start, goal = query
+    return worker_planner.plan(start, goal)
+
+
+def cost_to_go(grid, goal):
+    """
+    Returns the cost-to-go field of `goal` over the 8-connected grid,
+    see `GridPlanner.cost_to_go`.
+    """
+    return GridPlanner(grid).cost_to_go(goal)
+
+
+def descend(field, start):
+    """
+    Extracts the optimal path from `start` to the goal of a cost-to-go
+    field by repeatedly taking the action that leads to the neighbour
+    with the lowest cost plus action cost, in O(path length).
+
+    Returns the same `(path, cost)` tuple as `a_star`.
+    """
+    n, m = field.shape
+    node = (int(start[0]), int(start[1]))
+    if not np.isfinite(field[node]):
+        print('**********************')
+        print('Failed to find a path!')
+        print('**********************')
+        return [], 0
+
+    path = [node]
+    while field[node] > 0:
+        best, best_cost = None, np.inf
+        for action in Action:
+            da = action.delta
+            next_node = (node[0] + da[0], node[1] + da[1])
+            if 0 <= next_node[0] < n and 0 <= next_node[1] < m:
+                cost = action.cost + field[next_node]
+                if cost < best_cost:
+                    best, best_cost = next_node, cost
+        node = best
+        path.append(node)
+    return path, float(field[path[0]])
+
+
+def field_heuristic(field):
+    """
+    Returns the cost-to-go field as a heuristic for `a_star`; it is exact
+    for queries towards the field's goal.
+    """
+    return lambda position, goal_position: field[int(position[0]), int(position[1])]
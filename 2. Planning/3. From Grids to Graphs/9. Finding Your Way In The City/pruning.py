@@ -0,0 +1,61 @@
+import numpy as np
+
+from grid import free_segments
+
+
+def collinearity_dets(points):
+    """
+    Returns the determinants of all triples of consecutive points,
+    i.e. of the matrices `[[x1, y1, 1], [x2, y2, 1], [x3, y3, 1]]`,
+    computed in one pass. Entry `i` belongs to point `i + 1`.
+    """
+    p = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    p1, p2, p3 = p[:-2], p[1:-1], p[2:]
+    return (p1[:, 0] * (p2[:, 1] - p3[:, 1])
+            + p2[:, 0] * (p3[:, 1] - p1[:, 1])
+            + p3[:, 0] * (p1[:, 1] - p2[:, 1]))
+
+
+def prune_path(path, epsilon=1e-6):
+    """
+    Removes every point of the path that is collinear with its
+    neighbours, like the notebook's `prune_path`, but checks all
+    triples at once instead of one determinant per step.
+    """
+    if path is None or len(path) < 3:
+        return path
+    keep = np.ones(len(path), dtype=np.bool_)
+    keep[1:-1] = np.abs(collinearity_dets(path)) >= epsilon
+    return [p for p, k in zip(path, keep) if k]
+
+
+def shortcut_path(grid, path, lookahead=None, supercover=True):
+    """
+    Greedy line-of-sight smoothing: from every kept waypoint jump
+    straight to the furthest later waypoint that can be reached without
+    crossing an obstacle.
+
+    All candidate segments from the current waypoint, up to `lookahead`
+    waypoints ahead, are tested against the grid in one batch with
+    `free_segments`. With `supercover` set (the default), every cell the
+    straight segment between the cell centers passes through must be free.
+    Works best on a path that was pruned with `prune_path` first.
+    """
+    if path is None or len(path) < 3:
+        return path
+    # segments run between cell centers
+    points = np.asarray(path, dtype=np.float64).reshape(-1, 2) + 0.5
+    last = len(points) - 1
+
+    smoothed = [path[0]]
+    i = 0
+    while i < last:
+        stop = last if lookahead is None else min(last, i + lookahead)
+        candidates = np.arange(i + 1, stop + 1)
+        visible = free_segments(grid, np.repeat(points[i:i + 1], candidates.size, axis=0),
+                                points[candidates], supercover)
+        # the next waypoint is always reachable along the original path
+        visible[0] = True
+        i = int(candidates[np.flatnonzero(visible)[-1]])
+        smoothed.append(path[i])
+    return smoothed
@@ -0,0 +1,32 @@
+import numpy as np
+
+from hierarchical import HierarchicalPlanner
+from planning import a_star_array
+
+
+def octile(a, b):
+    dx, dy = abs(a[0] - b[0]), abs(a[1] - b[1])
+    return 10 * abs(dx - dy) + 14 * min(dx, dy)
+
+
+def test_start_on_cluster_border():
+    # (5, 10) is a one cell cluster, so the start is a transition cell
+    grid = np.zeros((6, 11))
+    planner = HierarchicalPlanner(grid, cluster_size=5)
+    path, cost = planner.plan((5, 10), (3, 8))
+    assert path[0] == (5, 10) and path[-1] == (3, 8)
+    assert cost == 28
+
+
+def test_matches_a_star_reachability():
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        grid = (rng.random((40, 40)) < 0.2).astype(float)
+        planner = HierarchicalPlanner(grid, cluster_size=8)
+        free = np.argwhere(grid == 0)
+        for _ in range(40):
+            start, goal = map(tuple, free[rng.choice(len(free), 2)].tolist())
+            _, cost = planner.plan(start, goal)
+            _, best = a_star_array(grid, octile, start, goal)
+            assert (cost > 0) == (best > 0)
+            assert best <= cost
@@ -0,0 +1,90 @@
+import hashlib
+import os
+import tempfile
+import numpy as np
+
+from grid import create_grid
+from voxmap import create_voxmap
+
+
+CACHE_DIR = '.cache'
+
+
+def file_digest(filename):
+    """
+    Returns the SHA-1 hex digest of a file's contents.
+    """
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def data_digest(data):
+    """
+    Returns the SHA-1 hex digest of an obstacle data array.
+    """
+    data = np.ascontiguousarray(data, dtype=np.float64)
+    sha = hashlib.sha1(str(data.shape).encode())
+    sha.update(data.tobytes())
+    return sha.hexdigest()
+
+
+def save_npy(filename, array):
+    """
+    Writes the array to a temporary file first and then moves it into
+    place, so concurrent readers never see a partially written file.
+    """
+    directory = os.path.dirname(filename) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp, filename)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def cached(filename, build):
+    """
+    Memory-maps `filename` if it exists, otherwise stores the result of
+    `build()` there first. The returned array is read-only and its pages
+    are shared by every process that maps the same file.
+    """
+    if not os.path.exists(filename):
+        save_npy(filename, build())
+    return np.load(filename, mmap_mode='r')
+
+
+def load_colliders(filename, cache_dir=CACHE_DIR):
+    """
+    Returns the obstacle data of a colliders CSV file.
+
+    The parsed data is kept as a binary sidecar keyed by the hash of the
+    file, so the text only needs to be parsed again when it changes.
+    """
+    name = os.path.splitext(os.path.basename(filename))[0]
+    sidecar = os.path.join(cache_dir, '{}-{}.npy'.format(name, file_digest(filename)))
+    return cached(sidecar, lambda: np.loadtxt(filename, delimiter=',', dtype=np.float64, skiprows=2))
+
+
+def cached_grid(data, drone_altitude, safety_distance, cache_dir=CACHE_DIR):
+    """
+    Returns `create_grid(data, drone_altitude, safety_distance)`, cached on
+    disk per obstacle data, altitude and safety distance.
+    """
+    filename = os.path.join(cache_dir, 'grid-{}-{!r}-{!r}.npy'.format(
+        data_digest(data), float(drone_altitude), float(safety_distance)))
+    return cached(filename, lambda: create_grid(data, drone_altitude, safety_distance))
+
+
+def cached_voxmap(data, voxel_size=5, cache_dir=CACHE_DIR):
+    """
+    Returns `create_voxmap(data, voxel_size)`, cached on disk per
+    obstacle data and voxel size.
+    """
+    filename = os.path.join(cache_dir, 'voxmap-{}-{!r}.npy'.format(data_digest(data), float(voxel_size)))
+    return cached(filename, lambda: create_voxmap(data, voxel_size))
@@ -0,0 +1,169 @@
+import heapq
+import numpy as np
+
+from planning import Action
+
+
+class DStarLite:
+    """
+    Incremental replanning with D* Lite over the grid used by `a_star`.
+
+    The search runs backwards from the goal and keeps its state between
+    calls. When cells become occupied or free, or the vehicle moves,
+    only the part of the search affected by the change is repaired
+    instead of planning from scratch.
+
+    As in `valid_actions`, an action is possible whenever the target
+    cell lies on the grid and is not an obstacle.
+    """
+
+    def __init__(self, grid, start, goal):
+        self._blocked = np.asarray(grid) == 1
+        self._start = (int(start[0]), int(start[1]))
+        self._goal = (int(goal[0]), int(goal[1]))
+        self._last = self._start
+        self._km = 0.0
+        self._actions = [(a.delta, float(a.cost)) for a in Action]
+        self._straight_cost = min(a.cost for a in Action if 0 in a.delta)
+        self._diagonal_cost = min(a.cost for a in Action if 0 not in a.delta)
+
+        self._g = np.full(self._blocked.shape, np.inf)
+        self._rhs = np.full(self._blocked.shape, np.inf)
+        self._rhs[self._goal] = 0.0
+        self._queue = []
+        self._keys = {}
+        self.push(self._goal)
+
+    @property
+    def start(self):
+        return self._start
+
+    @property
+    def goal(self):
+        return self._goal
+
+    def heuristic(self, a, b):
+        # octile distance
+        dx, dy = abs(a[0] - b[0]), abs(a[1] - b[1])
+        return self._straight_cost * abs(dx - dy) + self._diagonal_cost * min(dx, dy)
+
+    def neighbours(self, node):
+        n, m = self._blocked.shape
+        for (dx, dy), cost in self._actions:
+            x, y = node[0] + dx, node[1] + dy
+            if 0 <= x < n and 0 <= y < m:
+                yield (x, y), cost
+
+    def successors(self, node):
+        for next_node, cost in self.neighbours(node):
+            if not self._blocked[next_node]:
+                yield next_node, cost
+
+    def key(self, node):
+        k = min(self._g[node], self._rhs[node])
+        # rounded so that keys which only differ by floating point error
+        # of the summed sqrt(2) costs tie instead of stopping the search early
+        return (round(k + self.heuristic(self._start, node) + self._km, 9), round(k, 9))
+
+    def push(self, node):
+        key = self.key(node)
+        self._keys[node] = key
+        heapq.heappush(self._queue, (key, node))
+
+    def top(self):
+        """Drops outdated queue entries and returns the current top."""
+        while self._queue:
+            key, node = self._queue[0]
+            if self._keys.get(node) == key:
+                return key, node
+            heapq.heappop(self._queue)
+        return (np.inf, np.inf), None
+
+    def update_vertex(self, node):
+        if node != self._goal:
+            self._rhs[node] = min(
+                (cost + self._g[next_node] for next_node, cost in self.successors(node)), default=np.inf)
+        self._keys.pop(node, None)
+        if self._g[node] != self._rhs[node]:
+            self.push(node)
+
+    def compute_shortest_path(self):
+        while True:
+            key, node = self.top()
+            if node is None:
+                break
+            if not (key < self.key(self._start) or self._rhs[self._start] != self._g[self._start]):
+                break
+
+            new_key = self.key(node)
+            if key < new_key:
+                self.push(node)
+            elif self._g[node] > self._rhs[node]:
+                self._g[node] = self._rhs[node]
+                del self._keys[node]
+                for prev_node, _ in self.neighbours(node):
+                    self.update_vertex(prev_node)
+            else:
+                self._g[node] = np.inf
+                self.update_vertex(node)
+                for prev_node, _ in self.neighbours(node):
+                    self.update_vertex(prev_node)
+
+    def move_to(self, start):
+        """
+        Moves the start of the search to the vehicle's new position.
+        """
+        start = (int(start[0]), int(start[1]))
+        self._km += self.heuristic(self._last, start)
+        self._last = start
+        self._start = start
+
+    def update_cells(self, cells, occupied):
+        """
+        Marks the given cells as occupied (or free) and repairs the
+        search state around them.
+        """
+        changed = []
+        for cell in cells:
+            cell = (int(cell[0]), int(cell[1]))
+            if self._blocked[cell] != bool(occupied):
+                self._blocked[cell] = bool(occupied)
+                changed.append(cell)
+        if changed:
+            # the km offset keeps old keys valid after the start moved
+            self._km += self.heuristic(self._last, self._start)
+            self._last = self._start
+        for cell in changed:
+            # edges into `cell` changed, i.e. those of its neighbours
+            for prev_node, _ in self.neighbours(cell):
+                self.update_vertex(prev_node)
+
+    def update_grid(self, grid):
+        """
+        Applies all differences between `grid` and the known grid.
+        """
+        blocked = np.asarray(grid) == 1
+        self.update_cells(np.argwhere(blocked & ~self._blocked), True)
+        self.update_cells(np.argwhere(~blocked & self._blocked), False)
+
+    def plan(self):
+        """
+        Repairs the search and returns the current `(path, cost)` from
+        the start to the goal, like `a_star`.
+        """
+        self.compute_shortest_path()
+        path = []
+        path_cost = 0
+        if np.isfinite(self._g[self._start]):
+            print('Found a path.')
+            path_cost = float(self._g[self._start])
+            node = self._start
+            path.append(node)
+            while node != self._goal:
+                node = min(self.successors(node), key=lambda s: s[1] + self._g[s[0]])[0]
+                path.append(node)
+        else:
+            print('**********************')
+            print('Failed to find a path!')
+            print('**********************')
+        return path, path_cost
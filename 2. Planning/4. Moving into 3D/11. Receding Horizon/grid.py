@@ -1,6 +1,24 @@
 import numpy as np
 
 
+def obstacle_mask(shape, north_lo, north_hi, east_lo, east_hi):
+    """
+    Returns a boolean mask of the given shape marking every cell that is
+    covered by at least one of the inclusive index boxes
+    `[north_lo, north_hi] x [east_lo, east_hi]`.
+
+    Instead of slicing each box into the grid, the four corners of all
+    boxes are scattered into a difference array at once; its 2D prefix
+    sum counts the boxes covering each cell.
+    """
+    corners = np.zeros((shape[0] + 1, shape[1] + 1), dtype=np.int64)
+    np.add.at(corners, (north_lo, east_lo), 1)
+    np.add.at(corners, (north_lo, east_hi + 1), -1)
+    np.add.at(corners, (north_hi + 1, east_lo), -1)
+    np.add.at(corners, (north_hi + 1, east_hi + 1), 1)
+    return corners.cumsum(axis=0).cumsum(axis=1)[:-1, :-1] > 0
+
+
 def create_grid(data, drone_altitude, safety_distance):
     """
     Returns a grid representation of a 2D configuration space
@@ -25,15 +43,69 @@ def create_grid(data, drone_altitude, safety_distance):
     grid = np.zeros((north_size, east_size))
 
     # Populate the grid with obstacles
-    for i in range(data.shape[0]):
-        north, east, alt, d_north, d_east, d_alt = data[i, :]
-        if alt + d_alt + safety_distance > drone_altitude:
-            obstacle = [
-                int(np.clip(north - d_north - safety_distance - north_min, 0, north_size-1)),
-                int(np.clip(north + d_north + safety_distance - north_min, 0, north_size-1)),
-                int(np.clip(east - d_east - safety_distance - east_min, 0, east_size-1)),
-                int(np.clip(east + d_east + safety_distance - east_min, 0, east_size-1)),
-            ]
-            grid[obstacle[0]:obstacle[1]+1, obstacle[2]:obstacle[3]+1] = 1
-
-    return grid
\ No newline at end of file
+    obstacles = data[data[:, 2] + data[:, 5] + safety_distance > drone_altitude]
+    north, east, alt, d_north, d_east, d_alt = obstacles.T
+    grid[obstacle_mask(
+        grid.shape,
+        np.clip(north - d_north - safety_distance - north_min, 0, north_size-1).astype(int),
+        np.clip(north + d_north + safety_distance - north_min, 0, north_size-1).astype(int),
+        np.clip(east - d_east - safety_distance - east_min, 0, east_size-1).astype(int),
+        np.clip(east + d_east + safety_distance - east_min, 0, east_size-1).astype(int),
+    )] = 1
+
+    return grid
+
+
+def create_height_map(data, safety_distance):
+    """
+    Returns a 2D array holding, for every cell, the height of the
+    tallest obstacle covering it plus the safety distance, or `-inf`
+    where there is no obstacle.
+
+    The grid for any drone altitude is a single comparison away, i.e.
+    `height_map > drone_altitude` marks the same cells as
+    `create_grid(data, drone_altitude, safety_distance)`.
+    """
+
+    # minimum and maximum north coordinates
+    north_min = np.floor(np.min(data[:, 0] - data[:, 3]))
+    north_max = np.ceil(np.max(data[:, 0] + data[:, 3]))
+
+    # minimum and maximum east coordinates
+    east_min = np.floor(np.min(data[:, 1] - data[:, 4]))
+    east_max = np.ceil(np.max(data[:, 1] + data[:, 4]))
+
+    # given the minimum and maximum coordinates we can
+    # calculate the size of the grid.
+    north_size = int(np.ceil(north_max - north_min))
+    east_size = int(np.ceil(east_max - east_min))
+
+    north, east, alt, d_north, d_east, d_alt = data.T
+    north_lo = np.clip(north - d_north - safety_distance - north_min, 0, north_size-1).astype(int)
+    north_hi = np.clip(north + d_north + safety_distance - north_min, 0, north_size-1).astype(int)
+    east_lo = np.clip(east - d_east - safety_distance - east_min, 0, east_size-1).astype(int)
+    east_hi = np.clip(east + d_east + safety_distance - east_min, 0, east_size-1).astype(int)
+    heights = data[:, 2] + data[:, 5] + safety_distance
+
+    # Expand every box into the flat list of its cells, then keep
+    # the maximum height per cell.
+    rows = north_hi - north_lo + 1
+    cols = east_hi - east_lo + 1
+    areas = rows * cols
+    box = np.repeat(np.arange(data.shape[0]), areas)
+    k = np.arange(box.size) - np.repeat(np.cumsum(areas) - areas, areas)
+
+    height_map = np.full((north_size, east_size), -np.inf)
+    np.maximum.at(height_map, (north_lo[box] + k // cols[box], east_lo[box] + k % cols[box]), heights[box])
+
+    return height_map
+
+
+def create_grid_stack(data, drone_altitudes, safety_distance):
+    """
+    Returns a boolean `(n_altitudes, north, east)` array holding the
+    grid for each of the given drone altitudes, rasterizing the
+    obstacle data only once.
+    """
+    height_map = create_height_map(data, safety_distance)
+    return height_map[np.newaxis] > np.asarray(drone_altitudes, dtype=np.float64)[:, np.newaxis, np.newaxis]
@@ -0,0 +1,303 @@
+import numpy as np
+
+
+class OccupancyGrid:
+    """
+    A compact, read-only occupancy grid.
+
+    2D grids are stored with one byte per cell, 3D voxmaps with one bit
+    per voxel, packed along the altitude axis. Indexing behaves like the
+    dense array, so checks such as `grid[x, y] == 1` keep working;
+    slices are unpacked on the fly.
+    """
+
+    def __init__(self, grid):
+        grid = np.asarray(grid) != 0
+        self._shape = grid.shape
+        if grid.ndim == 2:
+            self._data = grid.astype(np.uint8)
+        elif grid.ndim == 3:
+            self._data = np.packbits(grid, axis=-1)
+        else:
+            raise ValueError('only 2D and 3D grids are supported')
+        self._neighbour_bits = {}
+
+    @classmethod
+    def from_packed(cls, packed, shape):
+        """
+        Wraps bits that were already packed along the last axis,
+        e.g. by `np.packbits(voxmap, axis=-1)`.
+        """
+        grid = cls.__new__(cls)
+        grid._shape = tuple(shape)
+        grid._data = packed
+        grid._neighbour_bits = {}
+        return grid
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def ndim(self):
+        return len(self._shape)
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def __len__(self):
+        return self._shape[0]
+
+    def __getitem__(self, key):
+        if self.ndim == 2:
+            return self._data[key]
+
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),) * (3 - len(key))
+        x, y, z = key
+
+        # Fast path: read a single bit straight from its byte.
+        if all(isinstance(k, (int, np.integer)) for k in key):
+            if z < 0:
+                z += self._shape[2]
+            if not 0 <= z < self._shape[2]:
+                raise IndexError('index {} is out of bounds for axis 2 with size {}'.format(z, self._shape[2]))
+            return (self._data[x, y, z >> 3] >> (7 - (z & 7))) & 1
+
+        bits = np.unpackbits(self._data[x, y], axis=-1, count=self._shape[2])
+        return bits[..., z]
+
+    def to_dense(self):
+        """
+        Returns the grid as a dense array of zeros and ones.
+        """
+        if self.ndim == 2:
+            return self._data.copy()
+        return np.unpackbits(self._data, axis=-1, count=self._shape[2]).astype(np.bool_)
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.to_dense()
+        return dense if dtype is None else dense.astype(dtype)
+
+    def neighbour_bits(self, deltas):
+        """
+        Returns a uint8 array with one entry per cell of a 2D grid in which
+        bit `i` is set if moving by `deltas[i]` leaves the grid or ends in
+        an obstacle. Supports up to eight deltas; results are cached per
+        (hashable) `deltas` sequence.
+        """
+        if deltas not in self._neighbour_bits:
+            if self.ndim != 2 or len(deltas) > 8:
+                raise ValueError('neighbour bits require a 2D grid and at most 8 deltas')
+
+            # Pad with obstacles so that leaving the grid counts as blocked.
+            padded = np.pad(self._data, 1, constant_values=1)
+            n, m = self._shape
+            bits = np.zeros(self._shape, dtype=np.uint8)
+            for i, (dx, dy) in enumerate(deltas):
+                bits |= padded[1 + dx:1 + dx + n, 1 + dy:1 + dy + m] << i
+            self._neighbour_bits[deltas] = bits
+
+        return self._neighbour_bits[deltas]
+
+
+class SparseVoxmap:
+    """
+    A 3D voxmap that only stores the parts of the volume containing
+    obstacles.
+
+    The volume is split into cubic chunks of `chunk_size` voxels per
+    side, kept in a dict keyed by chunk index. Chunks without a single
+    occupied voxel are never stored, so memory scales with the obstacle
+    volume rather than the bounding box, and queries into empty chunks
+    return without touching any voxel data. Indexing behaves like the
+    dense boolean voxmap.
+    """
+
+    def __init__(self, shape, chunk_size=16):
+        if len(shape) != 3:
+            raise ValueError('only 3D voxmaps are supported')
+        self._shape = tuple(int(s) for s in shape)
+        self._chunk_size = int(chunk_size)
+        self._chunks = {}
+
+    @classmethod
+    def from_boxes(cls, shape, boxes, chunk_size=16):
+        """
+        Builds the voxmap from half-open voxel index boxes
+        `(north_lo, north_hi, east_lo, east_hi, alt_lo, alt_hi)`,
+        as returned by `voxel_boxes`.
+        """
+        voxmap = cls(shape, chunk_size)
+        cs = voxmap._chunk_size
+        bounds = [
+            (np.clip(lo, 0, size), np.clip(hi, 0, size))
+            for lo, hi, size in zip(boxes[0::2], boxes[1::2], voxmap._shape)
+        ]
+        lo = np.stack([b[0] for b in bounds], axis=1).astype(np.int64)
+        hi = np.stack([b[1] for b in bounds], axis=1).astype(np.int64)
+        # drop boxes that are empty along any axis, just like empty slices
+        keep = np.all(lo < hi, axis=1)
+
+        for box_lo, box_hi in zip(lo[keep].tolist(), hi[keep].tolist()):
+            first = [l // cs for l in box_lo]
+            last = [(h - 1) // cs for h in box_hi]
+            for ci in range(first[0], last[0] + 1):
+                for cj in range(first[1], last[1] + 1):
+                    for ck in range(first[2], last[2] + 1):
+                        corner = (ci * cs, cj * cs, ck * cs)
+                        index = tuple(
+                            slice(max(l - c, 0), min(h - c, cs))
+                            for l, h, c in zip(box_lo, box_hi, corner)
+                        )
+                        voxmap._chunk((ci, cj, ck))[index] = True
+        return voxmap
+
+    @classmethod
+    def from_dense(cls, voxmap, chunk_size=16):
+        """
+        Converts a dense voxmap, keeping only the chunks that contain
+        an occupied voxel.
+        """
+        voxmap = np.asarray(voxmap) != 0
+        sparse = cls(voxmap.shape, chunk_size)
+        cs = sparse._chunk_size
+        counts = [-(-s // cs) for s in voxmap.shape]
+        padded = np.zeros([n * cs for n in counts], dtype=np.bool_)
+        padded[:voxmap.shape[0], :voxmap.shape[1], :voxmap.shape[2]] = voxmap
+        blocks = padded.reshape(counts[0], cs, counts[1], cs, counts[2], cs)
+        for ci, cj, ck in np.argwhere(blocks.any(axis=(1, 3, 5))).tolist():
+            sparse._chunks[(ci, cj, ck)] = blocks[ci, :, cj, :, ck, :].copy()
+        return sparse
+
+    def _chunk(self, key):
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            cs = self._chunk_size
+            chunk = self._chunks[key] = np.zeros((cs, cs, cs), dtype=np.bool_)
+        return chunk
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def ndim(self):
+        return 3
+
+    @property
+    def chunk_size(self):
+        return self._chunk_size
+
+    @property
+    def chunks(self):
+        """Indices of all chunks that contain an occupied voxel."""
+        return self._chunks.keys()
+
+    @property
+    def nbytes(self):
+        return sum(chunk.nbytes for chunk in self._chunks.values())
+
+    def __len__(self):
+        return self._shape[0]
+
+    def _axis_indices(self, k, size, axis):
+        if isinstance(k, slice):
+            return np.arange(*k.indices(size)), False
+        k = int(k)
+        if k < 0:
+            k += size
+        if not 0 <= k < size:
+            raise IndexError('index {} is out of bounds for axis {} with size {}'.format(k, axis, size))
+        return np.array([k]), True
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),) * (3 - len(key))
+        cs = self._chunk_size
+
+        # Fast path: a single voxel, an empty chunk answers right away.
+        if all(isinstance(k, (int, np.integer)) for k in key):
+            x, y, z = (self._axis_indices(k, s, a)[0][0] for a, (k, s) in enumerate(zip(key, self._shape)))
+            chunk = self._chunks.get((x // cs, y // cs, z // cs))
+            return False if chunk is None else bool(chunk[x % cs, y % cs, z % cs])
+
+        indices, scalar = zip(*(self._axis_indices(k, s, a) for a, (k, s) in enumerate(zip(key, self._shape))))
+        region = np.zeros([len(i) for i in indices], dtype=np.bool_)
+        # only visit the stored chunks the requested region overlaps
+        per_axis = [np.unique(i // cs).tolist() for i in indices]
+        for ci in per_axis[0]:
+            for cj in per_axis[1]:
+                for ck in per_axis[2]:
+                    chunk = self._chunks.get((ci, cj, ck))
+                    if chunk is None:
+                        continue
+                    select = [np.nonzero(i // cs == c)[0] for i, c in zip(indices, (ci, cj, ck))]
+                    region[np.ix_(*select)] = chunk[np.ix_(*(i[s] % cs for i, s in zip(indices, select)))]
+        return region[tuple(0 if s else slice(None) for s in scalar)]
+
+    def occupied(self, voxels):
+        """
+        Returns whether each of the `(n, 3)` voxel indices is occupied.
+        Voxels are grouped by chunk so every chunk is looked up once.
+        """
+        voxels = np.asarray(voxels, dtype=np.int64).reshape(-1, 3)
+        result = np.zeros(len(voxels), dtype=np.bool_)
+        if not len(voxels):
+            return result
+        cs = self._chunk_size
+        keys, inverse = np.unique(voxels // cs, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        local = voxels % cs
+        for i, key in enumerate(map(tuple, keys.tolist())):
+            chunk = self._chunks.get(key)
+            if chunk is None:
+                continue
+            members = np.nonzero(inverse == i)[0]
+            result[members] = chunk[local[members, 0], local[members, 1], local[members, 2]]
+        return result
+
+    def region_free(self, lo, hi):
+        """
+        Returns whether the half-open voxel box `[lo, hi)` is free,
+        skipping all chunks that are not stored.
+        """
+        cs = self._chunk_size
+        lo = [max(int(l), 0) for l in lo]
+        hi = [min(int(h), s) for h, s in zip(hi, self._shape)]
+        if any(l >= h for l, h in zip(lo, hi)):
+            return True
+        ranges = [range(l // cs, (h - 1) // cs + 1) for l, h in zip(lo, hi)]
+        if len(ranges[0]) * len(ranges[1]) * len(ranges[2]) <= len(self._chunks):
+            keys = ((ci, cj, ck) for ci in ranges[0] for cj in ranges[1] for ck in ranges[2])
+        else:
+            keys = (k for k in list(self._chunks) if all(c in r for c, r in zip(k, ranges)))
+        for key in keys:
+            chunk = self._chunks.get(key)
+            if chunk is None:
+                continue
+            index = tuple(
+                slice(max(l - c * cs, 0), min(h - c * cs, cs))
+                for l, h, c in zip(lo, hi, key)
+            )
+            if chunk[index].any():
+                return False
+        return True
+
+    def to_dense(self):
+        """
+        Returns the voxmap as a dense boolean array.
+        """
+        cs = self._chunk_size
+        dense = np.zeros(self._shape, dtype=np.bool_)
+        for (ci, cj, ck), chunk in self._chunks.items():
+            view = dense[ci * cs:(ci + 1) * cs, cj * cs:(cj + 1) * cs, ck * cs:(ck + 1) * cs]
+            view[...] = chunk[:view.shape[0], :view.shape[1], :view.shape[2]]
+        return dense
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.to_dense()
+        return dense if dtype is None else dense.astype(dtype)
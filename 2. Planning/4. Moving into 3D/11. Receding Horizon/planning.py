@@ -1,6 +1,9 @@
 from enum import Enum
+from itertools import product
 from queue import PriorityQueue
+import heapq
 import numpy as np
+from occupancy import OccupancyGrid
 
 # Quadroter assume all actions cost the same.
 class Action(Enum):
@@ -30,10 +33,18 @@ class Action(Enum):
         return (self.value[0], self.value[1])
 
 
+ACTION_DELTAS = tuple(a.delta for a in Action)
+
+
 def valid_actions(grid, current_node):
     """
     Returns a list of valid actions given a grid and current node.
     """
+    if isinstance(grid, OccupancyGrid):
+        # Fast path: one byte holds the blocked flag of every action.
+        blocked = grid.neighbour_bits(ACTION_DELTAS)[current_node]
+        return [a for i, a in enumerate(Action) if not (blocked >> i) & 1]
+
     valid_actions = list(Action)
     n, m = grid.shape[0] - 1, grid.shape[1] - 1
     x, y = current_node
@@ -113,3 +124,248 @@ def a_star(grid, h, start, goal):
         print('**********************') 
     return path[::-1], path_cost
 
+
+def action_table_3d(shape, connectivity=26):
+    """
+    Returns the deltas, flat index offsets and costs of all 3D moves
+    on a row-major array of the given shape.
+
+    With a `connectivity` of 6 only face neighbours are used, 18 adds
+    the edge neighbours and 26 the corner neighbours. A move costs the
+    length of its delta.
+    """
+    max_axes = {6: 1, 18: 2, 26: 3}[connectivity]
+    deltas = np.array([d for d in product((-1, 0, 1), repeat=3)
+                       if 0 < np.count_nonzero(d) <= max_axes], dtype=np.int64)
+    strides = np.array([shape[1] * shape[2], shape[2], 1], dtype=np.int64)
+    offsets = deltas @ strides
+    costs = np.linalg.norm(deltas, axis=1)
+    return deltas, offsets, costs
+
+
+def a_star_3d(voxmap, h, start, goal, connectivity=26):
+    """
+    A* directly over a 3D voxmap, as returned by `create_voxmap`,
+    with 6, 18 or 26 connected moves.
+
+    Voxels are addressed by their flat index into a copy of the voxmap
+    padded with a one voxel obstacle border, so validity of a move is a
+    single array lookup. Costs live in a flat array and each voxel only
+    stores the index of the move that reached it, which keeps the state
+    small enough for voxmaps of tens of millions of voxels.
+    Returns the same `(path, cost)` tuple as `a_star`.
+    """
+    voxmap = np.asarray(voxmap)
+    shape = tuple(s + 2 for s in voxmap.shape)
+    blocked = np.ones(shape, dtype=np.bool_)
+    blocked[1:-1, 1:-1, 1:-1] = voxmap != 0
+    blocked = blocked.ravel()
+
+    _, offsets, costs = action_table_3d(shape, connectivity)
+    actions = list(enumerate(zip(offsets.tolist(), costs.tolist())))
+
+    g = np.full(blocked.size, np.inf)
+    parent = np.full(blocked.size, 255, dtype=np.uint8)
+    closed = np.zeros(blocked.size, dtype=np.bool_)
+
+    plane, width = shape[1] * shape[2], shape[2]
+
+    def to_id(node):
+        return (int(node[0]) + 1) * plane + (int(node[1]) + 1) * width + int(node[2]) + 1
+
+    def to_node(i):
+        return (i // plane - 1, i % plane // width - 1, i % width - 1)
+
+    start_id = to_id(start)
+    goal_id = to_id(goal)
+    g[start_id] = 0.0
+
+    queue = [(0.0, start_id)]
+    found = False
+
+    while queue:
+        _, current = heapq.heappop(queue)
+        if closed[current]:
+            continue
+        if current == goal_id:
+            print('Found a path.')
+            found = True
+            break
+
+        closed[current] = True
+        current_cost = g[current]
+        for index, (offset, cost) in actions:
+            next_id = current + offset
+            if blocked[next_id] or closed[next_id]:
+                continue
+            branch_cost = current_cost + cost
+            if branch_cost < g[next_id]:
+                g[next_id] = branch_cost
+                parent[next_id] = index
+                queue_cost = branch_cost + h(to_node(next_id), goal)
+                heapq.heappush(queue, (queue_cost, next_id))
+
+    path = []
+    path_cost = 0
+    if found:
+        # retrace steps by undoing the stored moves
+        path_cost = float(g[goal_id])
+        n = goal_id
+        while n != start_id:
+            path.append(to_node(n))
+            n -= int(offsets[parent[n]])
+        path.append(to_node(start_id))
+    else:
+        print('**********************')
+        print('Failed to find a path!')
+        print('**********************')
+    return path[::-1], path_cost
+
+
+def jps(grid, start, goal, jump_points_only=False):
+    """
+    Jump Point Search over the 8-connected grid of `Action`.
+
+    Straight and diagonal moves are costed like the corresponding
+    actions and, as in `valid_actions`, a diagonal move only requires
+    the target cell to be free. The grid may also be an `OccupancyGrid`. The search only expands jump points,
+    so the returned cost is the same as that of an optimal A* search.
+
+    If `jump_points_only` is set, only the jump points are returned,
+    which is already a pruned path; otherwise the straight segments
+    between them are filled in cell by cell.
+    """
+
+    straight_cost = min(a.cost for a in Action if 0 in a.delta)
+    diagonal_cost = min(a.cost for a in Action if 0 not in a.delta)
+    grid = np.asarray(grid)
+    n, m = grid.shape
+    start = (int(start[0]), int(start[1]))
+    goal = (int(goal[0]), int(goal[1]))
+
+    # Nested lists are much cheaper to index cell by cell than the array.
+    blocked = (grid == 1).tolist()
+
+    def free(x, y):
+        return 0 <= x < n and 0 <= y < m and not blocked[x][y]
+
+    def h(x, y):
+        # octile distance
+        dx, dy = abs(x - goal[0]), abs(y - goal[1])
+        return straight_cost * abs(dx - dy) + diagonal_cost * min(dx, dy)
+
+    def jump_straight(x, y, dx, dy):
+        while True:
+            x += dx
+            y += dy
+            if not free(x, y):
+                return None
+            if (x, y) == goal:
+                return x, y
+            if dx != 0:
+                if (not free(x, y - 1) and free(x + dx, y - 1)) or \
+                        (not free(x, y + 1) and free(x + dx, y + 1)):
+                    return x, y
+            else:
+                if (not free(x - 1, y) and free(x - 1, y + dy)) or \
+                        (not free(x + 1, y) and free(x + 1, y + dy)):
+                    return x, y
+
+    def jump_diagonal(x, y, dx, dy):
+        while True:
+            x += dx
+            y += dy
+            if not free(x, y):
+                return None
+            if (x, y) == goal:
+                return x, y
+            if (not free(x - dx, y) and free(x - dx, y + dy)) or \
+                    (not free(x, y - dy) and free(x + dx, y - dy)):
+                return x, y
+            if jump_straight(x, y, dx, 0) is not None or \
+                    jump_straight(x, y, 0, dy) is not None:
+                return x, y
+
+    def directions(node, parent):
+        """Returns the pruned set of directions to search from `node`."""
+        x, y = node
+        if parent is None:
+            return [a.delta for a in Action]
+        dx = (x > parent[0]) - (x < parent[0])
+        dy = (y > parent[1]) - (y < parent[1])
+        if dx != 0 and dy != 0:
+            dirs = [(dx, 0), (0, dy), (dx, dy)]
+            if not free(x - dx, y):
+                dirs.append((-dx, dy))
+            if not free(x, y - dy):
+                dirs.append((dx, -dy))
+        elif dx != 0:
+            dirs = [(dx, 0)]
+            if not free(x, y - 1):
+                dirs.append((dx, -1))
+            if not free(x, y + 1):
+                dirs.append((dx, 1))
+        else:
+            dirs = [(0, dy)]
+            if not free(x - 1, y):
+                dirs.append((-1, dy))
+            if not free(x + 1, y):
+                dirs.append((1, dy))
+        return dirs
+
+    queue = [(h(*start), start)]
+    branch = {start: (0.0, None)}
+    closed = set()
+    found = False
+
+    while queue:
+        _, current_node = heapq.heappop(queue)
+        if current_node in closed:
+            continue
+        if current_node == goal:
+            print('Found a path.')
+            found = True
+            break
+
+        closed.add(current_node)
+        current_cost, parent = branch[current_node]
+        for dx, dy in directions(current_node, parent):
+            if dx != 0 and dy != 0:
+                jump_point = jump_diagonal(current_node[0], current_node[1], dx, dy)
+            else:
+                jump_point = jump_straight(current_node[0], current_node[1], dx, dy)
+            if jump_point is None or jump_point in closed:
+                continue
+
+            steps = max(abs(jump_point[0] - current_node[0]), abs(jump_point[1] - current_node[1]))
+            step_cost = diagonal_cost if dx != 0 and dy != 0 else straight_cost
+            branch_cost = current_cost + steps * step_cost
+            if jump_point not in branch or branch_cost < branch[jump_point][0]:
+                branch[jump_point] = (branch_cost, current_node)
+                heapq.heappush(queue, (branch_cost + h(*jump_point), jump_point))
+
+    path = []
+    path_cost = 0
+    if found:
+        # retrace steps
+        path_cost = branch[goal][0]
+        n = goal
+        while n is not None:
+            path.append(n)
+            n = branch[n][1]
+        path = path[::-1]
+
+        if not jump_points_only:
+            # fill in the cells between consecutive jump points
+            cells = [path[0]]
+            for p1, p2 in zip(path[:-1], path[1:]):
+                dx = (p2[0] > p1[0]) - (p2[0] < p1[0])
+                dy = (p2[1] > p1[1]) - (p2[1] < p1[1])
+                steps = max(abs(p2[0] - p1[0]), abs(p2[1] - p1[1]))
+                cells.extend((p1[0] + k * dx, p1[1] + k * dy) for k in range(1, steps + 1))
+            path = cells
+    else:
+        print('**********************')
+        print('Failed to find a path!')
+        print('**********************')
+    return path, path_cost
@@ -69,27 +69,48 @@ class Sampler:
         self._max_poly_xy = 2 * np.max((data[:, 3], data[:, 4]))
         centers = np.array([p.center for p in self._polygons])
         self._tree = KDTree(centers, metric='euclidean')
+        # Axis-aligned bounds and heights of all obstacles, so samples
+        # can be tested against them with plain interval comparisons.
+        self._bounds = np.column_stack((
+            data[:, 0] - data[:, 3], data[:, 0] + data[:, 3],
+            data[:, 1] - data[:, 4], data[:, 1] + data[:, 4],
+        ))
+        self._heights = data[:, 2] + data[:, 5]
 
     def sample(self, num_samples):
         """Implemented with a k-d tree for efficiency."""
         xvals = np.random.uniform(self._xmin, self._xmax, num_samples)
         yvals = np.random.uniform(self._ymin, self._ymax, num_samples)
         zvals = np.random.uniform(self._zmin, self._zmax, num_samples)
-        samples = list(zip(xvals, yvals, zvals))
-
-        pts = []
-        for s in samples:
-            in_collision = False
-            idxs = list(self._tree.query_radius(np.array([s[0], s[1]]).reshape(1, -1), r=self._max_poly_xy)[0])
-            if len(idxs) > 0:
-                for ind in idxs: 
-                    p = self._polygons[int(ind)]
-                    if p.contains(s) and p.height >= s[2]:
-                        in_collision = True
-            if not in_collision:
-                pts.append(s)
-                
-        return pts
+        samples = np.column_stack((xvals, yvals, zvals))
+
+        free = self.free(samples)
+        return list(zip(xvals[free], yvals[free], zvals[free]))
+
+    def free(self, samples):
+        """
+        Returns a boolean mask of the samples that are not inside an obstacle.
+
+        All samples are queried against the k-d tree at once and then
+        tested against the bounds of their nearby obstacles in one pass.
+        """
+        samples = np.asarray(samples, dtype=np.float64).reshape(-1, 3)
+        idxs = self._tree.query_radius(samples[:, :2], r=self._max_poly_xy)
+        counts = np.array([len(i) for i in idxs], dtype=np.int64)
+        if counts.sum() == 0:
+            return np.ones(len(samples), dtype=bool)
+
+        sample = np.repeat(np.arange(len(samples)), counts)
+        polygon = np.concatenate(idxs).astype(np.int64)
+        x, y, z = samples[sample].T
+        bounds = self._bounds[polygon]
+
+        # same as `Poly.contains`, which excludes the boundary
+        hit = (bounds[:, 0] < x) & (x < bounds[:, 1]) & \
+              (bounds[:, 2] < y) & (y < bounds[:, 3]) & \
+              (self._heights[polygon] >= z)
+
+        return np.bincount(sample[hit], minlength=len(samples)) == 0
 
     @property
     def polygons(self):
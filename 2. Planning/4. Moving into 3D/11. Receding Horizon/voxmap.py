@@ -1,11 +1,12 @@
 import numpy as np
+from occupancy import OccupancyGrid, SparseVoxmap
 
-def create_voxmap(data, voxel_size=5):
+
+def voxel_boxes(data, voxel_size):
     """
-    Returns a grid representation of a 3D configuration space
-    based on given obstacle data.
-    
-    The `voxel_size` argument sets the resolution of the voxel map. 
+    Returns the shape of the voxmap for the given obstacle data along
+    with the half-open voxel index boxes
+    `(north_lo, north_hi, east_lo, east_hi, alt_lo, alt_hi)` of all obstacles.
     """
     # minimum and maximum north coordinates
     north_min = np.floor(np.amin(data[:, 0] - data[:, 3]))
@@ -24,22 +25,184 @@ def create_voxmap(data, voxel_size=5):
     east_size = int(np.ceil((east_max - east_min))) // voxel_size
     alt_size = int(alt_max) // voxel_size
 
+    north, east, alt, d_north, d_east, d_alt = data.T
+    boxes = (
+        (north - d_north - north_min).astype(int) // voxel_size,
+        (north + d_north - north_min).astype(int) // voxel_size,
+        (east - d_east - east_min).astype(int) // voxel_size,
+        (east + d_east - east_min).astype(int) // voxel_size,
+        np.zeros(data.shape[0], dtype=int),
+        (alt + d_alt).astype(int) // voxel_size,
+    )
+    return (north_size, east_size, alt_size), boxes
+
+
+def create_voxmap(data, voxel_size=5):
+    """
+    Returns a grid representation of a 3D configuration space
+    based on given obstacle data.
+    
+    The `voxel_size` argument sets the resolution of the voxel map. 
+    """
+    shape, boxes = voxel_boxes(data, voxel_size)
+
     # Create an empty grid
-    voxmap = np.zeros((north_size, east_size, alt_size), dtype=np.bool)
-
-    for i in range(data.shape[0]):
-        # TODO: fill in the voxels that are part of an obstacle with `True`
-        #
-        # i.e. grid[0:5, 20:26, 2:7] = True
-        north, east, alt, d_north, d_east, d_alt = data[i, :]
-        obstacle = [
-            int(north - d_north - north_min) // voxel_size,
-            int(north + d_north - north_min) // voxel_size,
-            int(east - d_east - east_min) // voxel_size,
-            int(east + d_east - east_min) // voxel_size,
-        ]
-
-        height = int(alt + d_alt) // voxel_size
-        voxmap[obstacle[0]:obstacle[1], obstacle[2]:obstacle[3], 0:height] = True
-
-    return voxmap
\ No newline at end of file
+    voxmap = np.zeros(shape, dtype=np.bool_)
+
+    # Fill in the voxels that are part of an obstacle with `True`,
+    # i.e. grid[0:5, 20:26, 2:7] = True for all obstacles at once.
+    voxmap[voxel_mask(shape, *boxes)] = True
+
+    return voxmap
+
+
+def create_packed_voxmap(data, voxel_size=5, slab_size=64):
+    """
+    Returns the same voxmap as `create_voxmap` as an `OccupancyGrid`
+    that stores one bit per voxel.
+
+    The voxmap is rasterized in slabs of `slab_size` north voxels, so
+    the dense map never has to fit into memory as a whole.
+    """
+    shape, boxes = voxel_boxes(data, voxel_size)
+    north_lo, north_hi, east_lo, east_hi, alt_lo, alt_hi = boxes
+
+    packed = np.zeros((shape[0], shape[1], (shape[2] + 7) // 8), dtype=np.uint8)
+    for n0 in range(0, shape[0], slab_size):
+        n1 = min(n0 + slab_size, shape[0])
+        hit = (north_lo < n1) & (north_hi > n0)
+        slab = voxel_mask(
+            (n1 - n0, shape[1], shape[2]),
+            np.maximum(north_lo[hit] - n0, 0),
+            north_hi[hit] - n0,
+            east_lo[hit], east_hi[hit], alt_lo[hit], alt_hi[hit],
+        )
+        packed[n0:n1] = np.packbits(slab, axis=-1)
+
+    return OccupancyGrid.from_packed(packed, shape)
+
+
+def create_sparse_voxmap(data, voxel_size=5, chunk_size=16):
+    """
+    Returns the same voxmap as `create_voxmap` as a `SparseVoxmap`
+    that only stores the chunks of `chunk_size` voxels per side which
+    contain obstacles.
+    """
+    shape, boxes = voxel_boxes(data, voxel_size)
+    return SparseVoxmap.from_boxes(shape, boxes, chunk_size)
+
+
+def voxel_mask(shape, north_lo, north_hi, east_lo, east_hi, alt_lo, alt_hi):
+    """
+    Returns a boolean mask of the given shape marking every voxel that is
+    covered by at least one of the half-open index boxes
+    `[north_lo, north_hi) x [east_lo, east_hi) x [alt_lo, alt_hi)`.
+
+    The eight corners of all boxes are scattered into a 3D difference
+    array at once; its prefix sum counts the boxes covering each voxel.
+    """
+    corners = np.zeros((shape[0] + 1, shape[1] + 1, shape[2] + 1), dtype=np.int64)
+    bounds = [
+        (np.minimum(lo, size), np.minimum(hi, size))
+        for lo, hi, size in ((north_lo, north_hi, shape[0]),
+                             (east_lo, east_hi, shape[1]),
+                             (alt_lo, alt_hi, shape[2]))
+    ]
+    # drop boxes that are empty along any axis, just like empty slices
+    keep = np.all([lo < hi for lo, hi in bounds], axis=0)
+    bounds = [(lo[keep], hi[keep]) for lo, hi in bounds]
+    for i in range(2):
+        for j in range(2):
+            for k in range(2):
+                sign = -1 if (i + j + k) % 2 else 1
+                np.add.at(corners, (bounds[0][i], bounds[1][j], bounds[2][k]), sign)
+    return corners.cumsum(axis=0).cumsum(axis=1).cumsum(axis=2)[:-1, :-1, :-1] > 0
+
+
+class ObstacleIndex:
+    """
+    A spatial index over the obstacles of `data`, built once, from which
+    local voxmaps around the vehicle can be extracted cheaply.
+
+    The north/east plane is divided into square buckets of `cell_size`
+    meters; every bucket lists the obstacles whose footprint overlaps it,
+    stored in compressed sparse row form. A window query only visits the
+    buckets under the window and rasterizes the obstacles intersecting it.
+    """
+
+    def __init__(self, data, cell_size=50.0):
+        north, east, alt, d_north, d_east, d_alt = np.asarray(data, dtype=np.float64).T
+        self._lo = np.column_stack((north - d_north, east - d_east, np.zeros_like(alt)))
+        self._hi = np.column_stack((north + d_north, east + d_east, alt + d_alt))
+        self._cell_size = float(cell_size)
+        self._origin = self._lo[:, :2].min(axis=0)
+
+        first = self.bucket(self._lo[:, :2])
+        last = self.bucket(self._hi[:, :2])
+        self._buckets = tuple(int(n) for n in last.max(axis=0) + 1)
+
+        # expand every obstacle into all buckets its footprint covers
+        rows, cols = (last - first + 1).T
+        counts = rows * cols
+        obstacles = np.repeat(np.arange(len(counts)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cols = np.repeat(cols, counts)
+        bi = np.repeat(first[:, 0], counts) + local // cols
+        bj = np.repeat(first[:, 1], counts) + local % cols
+        buckets = bi * self._buckets[1] + bj
+
+        order = np.argsort(buckets, kind='stable')
+        self._obstacles = obstacles[order]
+        self._indptr = np.zeros(self._buckets[0] * self._buckets[1] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(buckets, minlength=self._indptr.size - 1), out=self._indptr[1:])
+
+    def bucket(self, points):
+        """
+        Returns the bucket indices of north/east points.
+        """
+        return np.floor((np.asarray(points)[..., :2] - self._origin) / self._cell_size).astype(np.int64)
+
+    def query(self, lo, hi):
+        """
+        Returns the indices of all obstacles intersecting the box
+        `[lo, hi)` given by its (north, east, altitude) corners.
+        """
+        lo = np.asarray(lo, dtype=np.float64)
+        hi = np.asarray(hi, dtype=np.float64)
+        first = np.maximum(self.bucket(lo), 0)
+        last = np.minimum(self.bucket(hi), np.array(self._buckets) - 1)
+        if np.any(first > last):
+            return np.zeros(0, dtype=np.int64)
+
+        # the buckets of one row are contiguous in the CSR arrays
+        width = self._buckets[1]
+        rows = np.arange(first[0], last[0] + 1) * width
+        starts = self._indptr[rows + first[1]]
+        stops = self._indptr[rows + last[1] + 1]
+        candidates = np.unique(np.concatenate([self._obstacles[a:b] for a, b in zip(starts, stops)]))
+
+        hit = np.all((self._lo[candidates] < hi) & (self._hi[candidates] > lo), axis=1)
+        return candidates[hit]
+
+    def local_voxmap(self, center, extent, voxel_size=5):
+        """
+        Returns a voxmap of the window reaching `extent` meters from
+        `center` along each axis, where `extent` is a scalar or a
+        (north, east, altitude) triple.
+
+        Voxel `(0, 0, 0)` starts at `center - extent`; a voxel is occupied
+        if any obstacle overlaps it. Only the obstacles intersecting the
+        window are rasterized.
+        """
+        center = np.asarray(center, dtype=np.float64)
+        extent = np.broadcast_to(np.asarray(extent, dtype=np.float64), (3,))
+        shape = tuple(int(n) for n in np.ceil(2 * extent / voxel_size))
+        lo = center - extent
+        hi = lo + np.array(shape) * voxel_size
+
+        hit = self.query(lo, hi)
+        box_lo = np.floor((self._lo[hit] - lo) / voxel_size).astype(np.int64)
+        box_hi = np.ceil((self._hi[hit] - lo) / voxel_size).astype(np.int64)
+        box_lo = np.maximum(box_lo, 0)
+        return voxel_mask(shape, box_lo[:, 0], box_hi[:, 0], box_lo[:, 1], box_hi[:, 1],
+                          box_lo[:, 2], box_hi[:, 2])
@@ -0,0 +1,179 @@
+import heapq
+import numpy as np
+
+
+class CSRGraph:
+    """
+    An undirected, weighted graph in compressed sparse row form.
+
+    Nodes are numbered `0..n-1`; the neighbours of node `i` are
+    `indices[indptr[i]:indptr[i+1]]` with the matching edge `weights`.
+    Node coordinates are kept in an `(n, d)` array so heuristics can be
+    computed for all nodes at once.
+    """
+
+    def __init__(self, nodes, coords, indptr, indices, weights):
+        self._nodes = list(nodes)
+        self._index = {n: i for i, n in enumerate(self._nodes)}
+        self._coords = np.asarray(coords, dtype=np.float64)
+        self._indptr = np.asarray(indptr, dtype=np.int64)
+        self._indices = np.asarray(indices, dtype=np.int64)
+        self._weights = np.asarray(weights, dtype=np.float64)
+        self._heuristic_scale = None
+
+    @classmethod
+    def from_edge_array(cls, nodes, coords, edges, weights):
+        """
+        Builds the graph from an `(m, 2)` array of node index pairs,
+        adding each edge in both directions.
+        """
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        weights = np.asarray(weights, dtype=np.float64)
+        n = len(coords)
+        src = np.concatenate((edges[:, 0], edges[:, 1]))
+        dst = np.concatenate((edges[:, 1], edges[:, 0]))
+        weights = np.concatenate((weights, weights))
+        order = np.argsort(src, kind='stable')
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        return cls(nodes, coords, indptr, dst[order], weights[order])
+
+    @classmethod
+    def from_edges(cls, edges):
+        """
+        Builds the graph from a list of `(p1, p2)` point tuples, as returned
+        by `create_grid_and_edges`, weighting edges by Euclidean distance.
+        """
+        index = {}
+        pairs = []
+        for p1, p2 in edges:
+            pairs.append((index.setdefault(p1, len(index)), index.setdefault(p2, len(index))))
+        nodes = list(index)
+        coords = np.array(nodes, dtype=np.float64).reshape(len(nodes), -1)
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        weights = np.linalg.norm(coords[pairs[:, 1]] - coords[pairs[:, 0]], axis=1)
+        return cls.from_edge_array(nodes, coords, pairs, weights)
+
+    @classmethod
+    def from_networkx(cls, graph, weight='weight'):
+        """
+        Converts a networkx graph whose nodes are coordinate tuples.
+        """
+        nodes = list(graph.nodes)
+        index = {n: i for i, n in enumerate(nodes)}
+        coords = np.array(nodes, dtype=np.float64).reshape(len(nodes), -1)
+        edges = np.array([(index[u], index[v]) for u, v in graph.edges], dtype=np.int64).reshape(-1, 2)
+        weights = np.array([w for _, _, w in graph.edges(data=weight, default=1.0)], dtype=np.float64)
+        return cls.from_edge_array(nodes, coords, edges, weights)
+
+    @property
+    def nodes(self):
+        return self._nodes
+
+    @property
+    def coords(self):
+        return self._coords
+
+    def heuristic_scale(self):
+        """
+        Returns the factor that keeps the Euclidean heuristic admissible:
+        the smallest ratio of an edge's weight to its Euclidean length,
+        capped at 1. It is 1 whenever the weights are at least the
+        geometric lengths, e.g. for graphs built by `from_edges`.
+        """
+        if self._heuristic_scale is None:
+            src = np.repeat(np.arange(len(self._nodes)), np.diff(self._indptr))
+            lengths = np.linalg.norm(self._coords[self._indices] - self._coords[src], axis=1)
+            geometric = lengths > 0
+            ratios = self._weights[geometric] / lengths[geometric]
+            self._heuristic_scale = float(min(1.0, ratios.min())) if ratios.size else 1.0
+        return self._heuristic_scale
+
+    def index(self, node):
+        """
+        Returns the index of a node given as its original key.
+        """
+        return self._index[node]
+
+    def nearest(self, point):
+        """
+        Returns the node closest to an arbitrary point.
+        """
+        point = np.asarray(point, dtype=np.float64)
+        d = np.linalg.norm(self._coords[:, :point.size] - point, axis=1)
+        return self._nodes[int(np.argmin(d))]
+
+    def search(self, start, goal=None, heuristic=True):
+        """
+        Best-first search from `start` over the CSR arrays.
+
+        With a `goal` and `heuristic` set this is A* using the Euclidean
+        distance of all nodes to the goal, computed in one call. The
+        distance is scaled by `heuristic_scale`, so paths stay optimal
+        even when edge weights are not geometric lengths, e.g. `weight=1`.
+        Without a goal it is Dijkstra's algorithm over the whole graph.
+
+        Returns the arrays of path costs and parent indices.
+        """
+        n = len(self._nodes)
+        start = self._index[start]
+        goal = None if goal is None else self._index[goal]
+        if goal is not None and heuristic:
+            h = self.heuristic_scale() * np.linalg.norm(self._coords - self._coords[goal], axis=1)
+        else:
+            h = np.zeros(n)
+
+        g = np.full(n, np.inf)
+        parent = np.full(n, -1, dtype=np.int64)
+        closed = np.zeros(n, dtype=bool)
+        g[start] = 0.0
+        queue = [(h[start], start)]
+
+        while queue:
+            _, current = heapq.heappop(queue)
+            if closed[current]:
+                continue
+            closed[current] = True
+            if current == goal:
+                break
+
+            lo, hi = self._indptr[current], self._indptr[current + 1]
+            neighbours = self._indices[lo:hi]
+            cost = g[current] + self._weights[lo:hi]
+            better = (cost < g[neighbours]) & ~closed[neighbours]
+            neighbours, cost = neighbours[better], cost[better]
+            g[neighbours] = cost
+            parent[neighbours] = current
+            for node, priority in zip(neighbours.tolist(), (cost + h[neighbours]).tolist()):
+                heapq.heappush(queue, (priority, node))
+
+        return g, parent
+
+    def a_star(self, start, goal):
+        """
+        A* between two nodes, returning the path as a list of node keys
+        and its cost, like the networkx based `a_star`.
+        """
+        g, parent = self.search(start, goal)
+        path = []
+        path_cost = 0
+        goal_index = self._index[goal]
+        if np.isfinite(g[goal_index]):
+            print('Found a path.')
+            path_cost = float(g[goal_index])
+            n = goal_index
+            while n != -1:
+                path.append(self._nodes[n])
+                n = int(parent[n])
+        else:
+            print('**********************')
+            print('Failed to find a path!')
+            print('**********************')
+        return path[::-1], path_cost
+
+    def dijkstra(self, start):
+        """
+        Returns the cost of the cheapest path from `start` to every node,
+        or `inf` for unreachable nodes.
+        """
+        return self.search(start)[0]
@@ -0,0 +1,384 @@
+from concurrent.futures import ProcessPoolExecutor
+import networkx as nx
+import numpy as np
+from sklearn.neighbors import KDTree
+
+from graph_search import CSRGraph
+
+
+class SegmentChecker:
+    """
+    Tests many segments at once against the axis-aligned obstacle boxes
+    of the colliders data.
+
+    The obstacle centers are kept in a k-d tree, so each segment is only
+    tested against the boxes that can possibly reach it.
+    """
+
+    def __init__(self, data):
+        self._bounds = np.column_stack((
+            data[:, 0] - data[:, 3], data[:, 0] + data[:, 3],
+            data[:, 1] - data[:, 4], data[:, 1] + data[:, 4],
+        ))
+        self._heights = data[:, 2] + data[:, 5]
+        # largest distance from an obstacle's center to one of its corners
+        self._max_radius = np.max(np.hypot(data[:, 3], data[:, 4]))
+        self._tree = KDTree(data[:, :2], metric='euclidean')
+
+    def free(self, p1, p2):
+        """
+        Returns a boolean mask of the segments `p1[i] -> p2[i]` that do
+        not pass through the interior of an obstacle at least as high as
+        the lower of their two end points.
+        """
+        p1 = np.asarray(p1, dtype=np.float64).reshape(-1, 3)
+        p2 = np.asarray(p2, dtype=np.float64).reshape(-1, 3)
+        if len(p1) == 0:
+            return np.ones(0, dtype=bool)
+
+        # Candidate boxes are those whose center lies within reach of the
+        # segment's bounding circle.
+        mid = (p1[:, :2] + p2[:, :2]) / 2
+        radius = np.linalg.norm(p2[:, :2] - p1[:, :2], axis=1) / 2 + self._max_radius
+        idxs = self._tree.query_radius(mid, r=radius)
+        counts = np.array([len(i) for i in idxs], dtype=np.int64)
+        if counts.sum() == 0:
+            return np.ones(len(p1), dtype=bool)
+
+        segment = np.repeat(np.arange(len(p1)), counts)
+        box = np.concatenate(idxs).astype(np.int64)
+
+        hit = self._heights[box] >= np.minimum(p1[segment, 2], p2[segment, 2])
+        hit &= self.crosses(p1[segment, :2], p2[segment, :2], self._bounds[box])
+
+        return np.bincount(segment[hit], minlength=len(p1)) == 0
+
+    def contains(self, points):
+        """
+        Returns a boolean mask of the points that lie inside an obstacle,
+        with the same semantics as `Sampler.free`.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        if len(points) == 0:
+            return np.zeros(0, dtype=bool)
+        idxs = self._tree.query_radius(points[:, :2], r=self._max_radius)
+        counts = np.array([len(i) for i in idxs], dtype=np.int64)
+        if counts.sum() == 0:
+            return np.zeros(len(points), dtype=bool)
+
+        point = np.repeat(np.arange(len(points)), counts)
+        box = np.concatenate(idxs).astype(np.int64)
+        x, y, z = points[point].T
+        bounds = self._bounds[box]
+        hit = (bounds[:, 0] < x) & (x < bounds[:, 1]) & \
+              (bounds[:, 2] < y) & (y < bounds[:, 3]) & \
+              (self._heights[box] >= z)
+        return np.bincount(point[hit], minlength=len(points)) > 0
+
+    @staticmethod
+    def crosses(p1, p2, bounds):
+        """
+        Slab test: returns whether each 2D segment `p1[i] -> p2[i]` passes
+        through the open interior of the box
+        `bounds[i] = (north_lo, north_hi, east_lo, east_hi)`.
+        """
+        d = p2 - p1
+        enter = np.zeros(len(p1))
+        leave = np.ones(len(p1))
+        inside = np.ones(len(p1), dtype=bool)
+        for axis in range(2):
+            lo, hi = bounds[:, 2 * axis], bounds[:, 2 * axis + 1]
+            p, v = p1[:, axis], d[:, axis]
+            moving = v != 0
+            # segments parallel to the slab must start inside of it
+            inside &= moving | ((lo < p) & (p < hi))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t1 = (lo - p) / v
+                t2 = (hi - p) / v
+            enter = np.where(moving, np.maximum(enter, np.minimum(t1, t2)), enter)
+            leave = np.where(moving, np.minimum(leave, np.maximum(t1, t2)), leave)
+        return inside & (enter < leave)
+
+
+def candidate_edges(nodes, k):
+    """
+    Returns the unique node index pairs `(i, j)` with `i < j` connecting
+    each node to its `k` nearest neighbours, from a single k-d tree query.
+    """
+    nodes = np.asarray(nodes, dtype=np.float64)
+    tree = KDTree(nodes)
+    idxs = tree.query(nodes, min(k, len(nodes)), return_distance=False)
+    pairs = np.column_stack((np.repeat(np.arange(len(nodes)), idxs.shape[1]), idxs.ravel()))
+    pairs = np.sort(pairs, axis=1)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    return np.unique(pairs, axis=0)
+
+
+def check_edges(checker, nodes, pairs):
+    """
+    Returns the mask of free edges.
+    """
+    return checker.free(nodes[pairs[:, 0]], nodes[pairs[:, 1]])
+
+
+# The checker, nodes and candidate edges of a worker process in `build_edges`.
+worker_edges = None
+
+
+def attach_edge_checker(checker, nodes, pairs):
+    """
+    Process pool initializer: keeps the checker, nodes and candidate
+    edges in the worker, so they are sent once per worker rather than
+    once per chunk.
+    """
+    global worker_edges
+    worker_edges = (checker, nodes, pairs)
+
+
+def check_edge_range(bounds):
+    checker, nodes, pairs = worker_edges
+    lo, hi = bounds
+    return check_edges(checker, nodes, pairs[lo:hi])
+
+
+def build_edges(data, nodes, k, processes=None, chunk_size=20000, checker=None):
+    """
+    Connects every node to its `k` nearest neighbours if the connecting
+    segment is free of obstacles.
+
+    Returns the free edges as an `(m, 2)` array of node indices along
+    with their Euclidean lengths. With `processes` set, the collision
+    checks are split into chunks of `chunk_size` edges and distributed
+    over a process pool. The checker, nodes and candidate edges are
+    sent to each worker once, the chunks only as index ranges.
+    """
+    nodes = np.asarray(nodes, dtype=np.float64)
+    if checker is None:
+        checker = SegmentChecker(data)
+    pairs = candidate_edges(nodes, k)
+    chunks = [(i, min(i + chunk_size, len(pairs))) for i in range(0, len(pairs), chunk_size)]
+
+    if processes is not None and processes > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=processes, initializer=attach_edge_checker,
+                                 initargs=(checker, nodes, pairs)) as pool:
+            masks = list(pool.map(check_edge_range, chunks))
+    else:
+        masks = [check_edges(checker, nodes, pairs[lo:hi]) for lo, hi in chunks]
+
+    free = np.concatenate(masks) if masks else np.zeros(0, dtype=bool)
+    edges = pairs[free]
+    weights = np.linalg.norm(nodes[edges[:, 1]] - nodes[edges[:, 0]], axis=1)
+    return edges, weights
+
+
+def create_graph(data, nodes, k, processes=None):
+    """
+    Returns the probabilistic roadmap over the given nodes as a
+    networkx graph, with edges weighted by their Euclidean length.
+    """
+    edges, weights = build_edges(data, nodes, k, processes)
+    nodes = [tuple(n) for n in nodes]
+    g = nx.Graph()
+    g.add_weighted_edges_from((nodes[i], nodes[j], w) for (i, j), w in zip(edges.tolist(), weights.tolist()))
+    return g
+
+
+class Roadmap:
+    """
+    A probabilistic roadmap that can be extended with new samples,
+    repaired when obstacles change and stored on disk in CSR form.
+
+    Nodes are kept in an `(n, 3)` array and edges as an `(m, 2)` array
+    of node indices with `i < j`, along with their Euclidean lengths.
+    """
+
+    def __init__(self, data, nodes=None, edges=None, weights=None, k=10):
+        self._checker = SegmentChecker(data)
+        self._k = k
+        self._nodes = np.zeros((0, 3)) if nodes is None else np.asarray(nodes, dtype=np.float64).reshape(-1, 3)
+        self._edges = np.zeros((0, 2), dtype=np.int64) if edges is None else np.asarray(edges, dtype=np.int64)
+        self._weights = np.zeros(0) if weights is None else np.asarray(weights, dtype=np.float64)
+        self._tree = None
+
+    @classmethod
+    def build(cls, data, nodes, k=10, processes=None):
+        """
+        Builds a roadmap from scratch, see `build_edges`.
+        """
+        roadmap = cls(data, k=k)
+        roadmap._nodes = np.asarray(nodes, dtype=np.float64).reshape(-1, 3)
+        roadmap._edges, roadmap._weights = build_edges(
+            data, roadmap._nodes, k, processes, checker=roadmap._checker)
+        return roadmap
+
+    @property
+    def nodes(self):
+        return self._nodes
+
+    @property
+    def edges(self):
+        return self._edges
+
+    @property
+    def weights(self):
+        return self._weights
+
+    @property
+    def tree(self):
+        """k-d tree over all nodes, rebuilt only after the nodes changed."""
+        if self._tree is None:
+            self._tree = KDTree(self._nodes)
+        return self._tree
+
+    def add_pairs(self, pairs):
+        """
+        Adds the free edges among the given node index pairs, skipping
+        self loops and edges that already exist.
+        """
+        pairs = np.sort(np.asarray(pairs, dtype=np.int64).reshape(-1, 2), axis=1)
+        pairs = np.unique(pairs[pairs[:, 0] != pairs[:, 1]], axis=0)
+
+        n = len(self._nodes)
+        known = np.isin(pairs[:, 0] * n + pairs[:, 1], self._edges[:, 0] * n + self._edges[:, 1])
+        pairs = pairs[~known]
+
+        free = check_edges(self._checker, self._nodes, pairs)
+        pairs = pairs[free]
+        weights = np.linalg.norm(self._nodes[pairs[:, 1]] - self._nodes[pairs[:, 0]], axis=1)
+        self._edges = np.concatenate((self._edges, pairs))
+        self._weights = np.concatenate((self._weights, weights))
+
+    def add_nodes(self, nodes):
+        """
+        Adds new samples and connects only them: each new node is joined
+        to its `k` nearest neighbours among the existing nodes, found
+        through the existing k-d tree, and among the other new nodes.
+
+        Returns the indices of the new nodes.
+        """
+        nodes = np.asarray(nodes, dtype=np.float64).reshape(-1, 3)
+        offset = len(self._nodes)
+        idxs = np.arange(offset, offset + len(nodes))
+
+        pairs = []
+        if offset > 0:
+            old = self.tree.query(nodes, min(self._k, offset), return_distance=False)
+            pairs.append(np.column_stack((np.repeat(idxs, old.shape[1]), old.ravel())))
+        if len(nodes) > 1:
+            new = KDTree(nodes).query(nodes, min(self._k, len(nodes)), return_distance=False) + offset
+            pairs.append(np.column_stack((np.repeat(idxs, new.shape[1]), new.ravel())))
+
+        self._nodes = np.concatenate((self._nodes, nodes))
+        self._tree = None
+        if pairs:
+            self.add_pairs(np.concatenate(pairs))
+        return idxs
+
+    def remove_nodes(self, mask):
+        """
+        Removes the nodes selected by the boolean mask along with
+        all of their edges.
+        """
+        keep = ~np.asarray(mask, dtype=bool)
+        remap = np.cumsum(keep) - 1
+        kept_edges = keep[self._edges].all(axis=1)
+        self._nodes = self._nodes[keep]
+        self._edges = remap[self._edges[kept_edges]]
+        self._weights = self._weights[kept_edges]
+        self._tree = None
+
+    def invalidate(self, data, changed):
+        """
+        Repairs the roadmap after obstacles were added, moved or removed.
+
+        `data` is the complete, updated colliders data and `changed` holds
+        the collider rows (old and new) covering the area that changed.
+        Only nodes and edges reaching into that area are changed: nodes
+        now inside an obstacle are removed and all edges and candidate
+        edges crossing the area are checked again. Finding the candidate
+        edges still takes one k-nearest-neighbour query over all nodes,
+        but collision checks are limited to the edges crossing the area.
+        """
+        self._checker = SegmentChecker(data)
+        changed = np.asarray(changed, dtype=np.float64).reshape(-1, 6)
+        if len(changed) == 0:
+            return
+
+        # Treat the changed area as infinitely high, so that everything
+        # crossing it is affected regardless of altitude.
+        area = changed.copy()
+        area[:, 2] = np.inf
+        area_checker = SegmentChecker(area)
+
+        near = np.flatnonzero(~area_checker.free(self._nodes, self._nodes))
+        blocked = np.zeros(len(self._nodes), dtype=bool)
+        blocked[near] = self._checker.contains(self._nodes[near])
+        self.remove_nodes(blocked)
+        if len(self._nodes) < 2:
+            return
+
+        neighbours = self.tree.query(self._nodes, min(self._k, len(self._nodes)), return_distance=False)
+        pairs = np.column_stack((np.repeat(np.arange(len(self._nodes)), neighbours.shape[1]), neighbours.ravel()))
+        pairs = np.concatenate((pairs, self._edges))
+        pairs = pairs[~check_edges(area_checker, self._nodes, pairs)]
+
+        affected = ~check_edges(area_checker, self._nodes, self._edges)
+        self._edges = self._edges[~affected]
+        self._weights = self._weights[~affected]
+        self.add_pairs(pairs)
+
+    def csr(self):
+        """
+        Returns the symmetric adjacency of the roadmap in CSR form as
+        `(indptr, indices, weights)`.
+        """
+        n = len(self._nodes)
+        src = np.concatenate((self._edges[:, 0], self._edges[:, 1]))
+        dst = np.concatenate((self._edges[:, 1], self._edges[:, 0]))
+        weights = np.concatenate((self._weights, self._weights))
+        order = np.lexsort((dst, src))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        return indptr, dst[order], weights[order]
+
+    def save(self, filename):
+        """
+        Stores the nodes and the CSR adjacency in a compressed `.npz` file.
+        """
+        indptr, indices, weights = self.csr()
+        np.savez_compressed(filename, nodes=self._nodes, indptr=indptr, indices=indices.astype(np.int32),
+                            weights=weights.astype(np.float32), k=self._k)
+
+    @classmethod
+    def load(cls, filename, data):
+        """
+        Loads a roadmap stored with `save` for the given colliders data.
+        """
+        with np.load(filename) as f:
+            nodes = f['nodes']
+            indptr, indices = f['indptr'], f['indices'].astype(np.int64)
+            k = int(f['k'])
+        src = np.repeat(np.arange(len(nodes)), np.diff(indptr))
+        upper = src < indices
+        edges = np.column_stack((src[upper], indices[upper]))
+        # recompute the lengths at full precision
+        weights = np.linalg.norm(nodes[edges[:, 1]] - nodes[edges[:, 0]], axis=1)
+        return cls(data, nodes, edges, weights, k)
+
+    def to_networkx(self):
+        """
+        Returns the roadmap as a networkx graph with tuple nodes.
+        """
+        nodes = [tuple(n) for n in self._nodes.tolist()]
+        g = nx.Graph()
+        g.add_nodes_from(nodes)
+        g.add_weighted_edges_from(
+            (nodes[i], nodes[j], w) for (i, j), w in zip(self._edges.tolist(), self._weights.tolist()))
+        return g
+
+    def to_csr_graph(self):
+        """
+        Returns the roadmap as a `CSRGraph` with tuple node keys.
+        """
+        nodes = [tuple(n) for n in self._nodes.tolist()]
+        return CSRGraph.from_edge_array(nodes, self._nodes, self._edges, self._weights)
@@ -0,0 +1,35 @@
+import numpy as np
+
+from roadmap import Roadmap, SegmentChecker
+
+
+def colliders():
+    # north, east, alt, d_north, d_east, d_alt
+    return np.array([
+        [10.0, 10.0, 5.0, 2.0, 2.0, 5.0],
+        [30.0, 20.0, 10.0, 3.0, 3.0, 10.0],
+        [20.0, 40.0, 8.0, 4.0, 2.0, 8.0],
+    ])
+
+
+def nodes(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    points = np.column_stack((rng.uniform(0, 50, n), rng.uniform(0, 50, n), rng.uniform(1, 20, n)))
+    return points[~SegmentChecker(colliders()).contains(points)]
+
+
+def test_contains_without_points():
+    assert SegmentChecker(colliders()).contains(np.zeros((0, 3))).shape == (0,)
+
+
+def test_invalidate_without_nodes_in_changed_area():
+    data = colliders()
+    roadmap = Roadmap.build(data, nodes(), k=5)
+    # a new obstacle far away from every node
+    changed = np.array([[500.0, 500.0, 5.0, 1.0, 1.0, 5.0]])
+    data = np.vstack((data, changed))
+    edges = {tuple(sorted(e)) for e in roadmap.edges.tolist()}
+
+    roadmap.invalidate(data, changed)
+    roadmap.invalidate(data, changed)
+    assert {tuple(sorted(e)) for e in roadmap.edges.tolist()} == edges
@@ -0,0 +1,44 @@
+import numpy as np
+
+from rrt import RRT, free_states, sample_states
+from steering import MAX_STEERING_ANGLE, best_control
+
+
+def generate_kinodynamic_RRT(grid, x_init, num_vertices, v, dt, steps=5, num_controls=32,
+                             batch_size=128, rng=np.random):
+    """
+    Grows an RRT of Dubins car states `[x, y, theta]`.
+
+    Each extension rolls out `num_controls` steering angles, spread
+    evenly over the allowed range and held for `steps` steps of `dt`,
+    from the nearest vertex in a single call. Trajectories that leave
+    the grid or hit an obstacle are dropped and the end state closest
+    to the sample becomes the new vertex, with the steering angle as
+    the input of its edge. Every control is used at most once per
+    vertex, so the tree never holds the same state twice.
+    """
+    rrt = RRT(x_init, capacity=num_vertices + 1)
+    angles = np.linspace(-MAX_STEERING_ANGLE, MAX_STEERING_ANGLE, num_controls)
+
+    used = {}
+
+    for start in range(0, num_vertices, batch_size):
+        x_rand = sample_states(grid, min(batch_size, num_vertices - start), rng)
+        dist, ind = rrt.nearest_distances(np.column_stack((x_rand, np.zeros(len(x_rand)))))
+        since = len(rrt)
+
+        for x, d, i in zip(x_rand, dist.tolist(), ind.tolist()):
+            _, near = rrt.refine_nearest(x, d, i, since)
+            unused = ~used.setdefault(near, np.zeros(num_controls, dtype=np.bool_))
+
+            def valid(trajectories):
+                points = trajectories.reshape(-1, 3)
+                free = free_states(grid, points).reshape(trajectories.shape[:2]).all(axis=1)
+                return free & unused
+
+            i, trajectory = best_control(rrt.vertices[near], x, angles, v, dt, steps, valid)
+            if i is not None:
+                used[near][i] = True
+                rrt.add_vertex(trajectory[-1], near, angles[i])
+
+    return rrt
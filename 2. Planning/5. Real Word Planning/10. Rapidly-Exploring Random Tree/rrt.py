@@ -0,0 +1,414 @@
+import math
+import numpy as np
+import networkx as nx
+from sklearn.neighbors import KDTree
+
+
+class RRT:
+    """
+    A rapidly-exploring random tree stored in growable arrays.
+
+    Vertex `i` has the state `vertices[i]`, the parent `parents[i]`
+    (`-1` for the root) and the input `inputs[i]` that led to it from
+    its parent. Nearest neighbour queries use a KDTree over the first
+    vertices, rebuilt once enough new vertices have accumulated, plus a
+    linear scan over the few vertices added since. Only the first two
+    state coordinates (north, east) are used for distances.
+    """
+
+    def __init__(self, x_init, capacity=1024):
+        x_init = np.asarray(x_init, dtype=np.float64).ravel()
+        capacity = max(int(capacity), 1)
+        self._vertices = np.empty((capacity, x_init.size))
+        self._vertices[0] = x_init
+        self._parents = np.full(capacity, -1, dtype=np.int64)
+        self._inputs = np.full(capacity, np.nan)
+        self._count = 1
+        self._index = None
+        self._indexed = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def vertices(self):
+        return self._vertices[:self._count]
+
+    @property
+    def parents(self):
+        return self._parents[:self._count]
+
+    @property
+    def inputs(self):
+        return self._inputs[:self._count]
+
+    @property
+    def edges(self):
+        """Edges as `(x_near, x_new)` state tuples, like the networkx tree."""
+        children = np.arange(1, self._count)
+        return [(tuple(self._vertices[p]), tuple(self._vertices[c]))
+                for p, c in zip(self._parents[children].tolist(), children.tolist())]
+
+    def add_vertex(self, x_new, parent, u):
+        """
+        Adds the state `x_new`, reached from vertex `parent` by input `u`,
+        and returns its index.
+        """
+        if self._count == len(self._vertices):
+            # double the capacity, so adding stays amortized O(1)
+            self._vertices = np.concatenate((self._vertices, np.empty_like(self._vertices)))
+            self._parents = np.concatenate((self._parents, np.full_like(self._parents, -1)))
+            self._inputs = np.concatenate((self._inputs, np.full_like(self._inputs, np.nan)))
+        i = self._count
+        self._vertices[i] = x_new
+        self._parents[i] = parent
+        self._inputs[i] = u
+        self._count += 1
+        return i
+
+    def reindex(self):
+        """
+        Rebuilds the KDTree over all current vertices.
+        """
+        self._index = KDTree(self._vertices[:self._count, :2])
+        self._indexed = self._count
+
+    def stale(self):
+        """
+        Whether the unindexed tail has grown large enough that scanning it
+        costs more than rebuilding the KDTree.
+        """
+        return self._count - self._indexed > max(256, 4 * int(np.sqrt(self._count)))
+
+    def nearest_distances(self, points):
+        """
+        Returns the distance and index of the vertex nearest to each point,
+        rebuilding the KDTree first if it is stale. Vertices added since
+        the last rebuild are compared against all points at once.
+        """
+        if self._index is None or self.stale():
+            self.reindex()
+        points = np.asarray(points, dtype=np.float64).reshape(-1, self._vertices.shape[1])
+        dist, ind = self._index.query(points[:, :2], k=1)
+        dist, ind = dist[:, 0], ind[:, 0]
+        if self._indexed < self._count:
+            tail = self._vertices[self._indexed:self._count]
+            d = ((points[:, 0, np.newaxis] - tail[:, 0]) ** 2
+                 + (points[:, 1, np.newaxis] - tail[:, 1]) ** 2)
+            i = np.argmin(d, axis=1)
+            d = np.sqrt(d[np.arange(len(points)), i])
+            closer = d < dist
+            dist[closer] = d[closer]
+            ind[closer] = self._indexed + i[closer]
+        return dist, ind
+
+    def refine_nearest(self, point, dist, ind, since):
+        """
+        Improves one `nearest_distances` result with the vertices that
+        were added after it was computed, i.e. from index `since` on.
+        """
+        if since >= self._count:
+            return dist, ind
+        d = np.hypot(*(self._vertices[since:self._count, :2] - point[:2]).T)
+        i = int(np.argmin(d))
+        if d[i] < dist:
+            return d[i], since + i
+        return dist, ind
+
+    def nearest(self, points):
+        """
+        Returns the index of the vertex nearest to each point.
+        """
+        return self.nearest_distances(points)[1]
+
+    def path(self, i):
+        """
+        Returns the states from the root to vertex `i`.
+        """
+        path = []
+        while i != -1:
+            path.append(tuple(self._vertices[i]))
+            i = self._parents[i]
+        return path[::-1]
+
+    def to_networkx(self):
+        """
+        Exports the tree as a networkx `DiGraph` over state tuples, with
+        the input stored as the `orientation` of each edge.
+        """
+        tree = nx.DiGraph()
+        tree.add_node(tuple(self._vertices[0]))
+        children = np.arange(1, self._count)
+        tree.add_edges_from(
+            (tuple(self._vertices[p]), tuple(self._vertices[c]), {'orientation': u})
+            for p, c, u in zip(self._parents[children].tolist(), children.tolist(),
+                               self._inputs[children].tolist()))
+        return tree
+
+
+def free_states(grid, states):
+    """
+    Returns a mask of the states whose cell lies on the grid and is free.
+    """
+    states = np.asarray(states, dtype=np.float64).reshape(-1, np.shape(states)[-1])
+    cells = np.floor(states[:, :2]).astype(np.int64)
+    inside = np.all((cells >= 0) & (cells < grid.shape[:2]), axis=1)
+    free = np.zeros(len(states), dtype=np.bool_)
+    free[inside] = grid[cells[inside, 0], cells[inside, 1]] == 0
+    return free
+
+
+def sample_states(grid, n, rng=np.random):
+    """
+    Draws `n` uniform samples from the free cells of the grid, in
+    batches rather than one rejection loop per sample.
+    """
+    free_fraction = max(np.mean(grid == 0), 1e-3)
+    samples = np.empty((0, 2))
+    while len(samples) < n:
+        batch = int((n - len(samples)) / free_fraction * 1.1) + 1
+        states = rng.uniform((0, 0), grid.shape[:2], size=(batch, 2))
+        samples = np.concatenate((samples, states[free_states(grid, states)]))
+    return samples[:n]
+
+
+def generate_RRT(grid, x_init, num_vertices, dt, batch_size=128, rng=np.random):
+    """
+    Array-backed version of the notebook's `generate_RRT`.
+
+    Samples are drawn and matched against the tree in batches of
+    `batch_size`, so each sample only has to be compared one by one
+    with the vertices added during its own batch. Every new state is
+    checked with a single grid lookup.
+    """
+    rrt = RRT(x_init, capacity=num_vertices + 1)
+    n, m = grid.shape[:2]
+
+    for start in range(0, num_vertices, batch_size):
+        x_rand = sample_states(grid, min(batch_size, num_vertices - start), rng)
+        dist, ind = rrt.nearest_distances(x_rand)
+        since = len(rrt)
+
+        for x, d, i in zip(x_rand, dist.tolist(), ind.tolist()):
+            _, near = rrt.refine_nearest(x, d, i, since)
+            x_near = rrt.vertices[near].tolist()
+            u = math.atan2(x[1] - x_near[1], x[0] - x_near[0])
+            x_new = (x_near[0] + math.cos(u) * dt, x_near[1] + math.sin(u) * dt)
+
+            if 0 <= x_new[0] < n and 0 <= x_new[1] < m and grid[int(x_new[0]), int(x_new[1])] == 0:
+                # the orientation `u` is kept as the input of the edge
+                rrt.add_vertex(x_new, near, u)
+
+    return rrt
+
+
+def free_segments(grid, p1, p2, resolution=0.5):
+    """
+    Returns a mask of the segments `p1[i] -> p2[i]` along which every
+    point, sampled at least every `resolution` cells, lies on a free
+    cell of the grid. All segments are checked at once.
+    """
+    p1 = np.asarray(p1, dtype=np.float64).reshape(-1, 2)
+    p2 = np.asarray(p2, dtype=np.float64).reshape(-1, 2)
+    counts = np.ceil(np.linalg.norm(p2 - p1, axis=1) / resolution).astype(np.int64) + 1
+    seg = np.repeat(np.arange(len(p1)), counts)
+    k = np.arange(seg.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    t = (k / np.maximum(counts[seg] - 1, 1))[:, np.newaxis]
+    points = p1[seg] + t * (p2[seg] - p1[seg])
+    blocked = ~free_states(grid, points)
+    return np.bincount(seg, weights=blocked, minlength=len(p1)) == 0
+
+
+class RRTStar(RRT):
+    """
+    An RRT that also stores the cost of reaching every vertex, so it can
+    choose the cheapest parent for new vertices and rewire its
+    neighbourhood, as in RRT*.
+
+    Costs live in an array next to the vertices; when a vertex is
+    rewired, the change in cost is pushed down to all its descendants.
+    Vertices within `goal_radius` of `x_goal` that see the goal are
+    remembered as solutions.
+    """
+
+    def __init__(self, x_init, x_goal, goal_radius=1.0, capacity=1024):
+        super().__init__(x_init, capacity)
+        self._costs = np.zeros(len(self._vertices))
+        self._children = [[]]
+        self._goal = np.asarray(x_goal, dtype=np.float64).ravel()
+        self._goal_radius = goal_radius
+        self._goal_vertices = []
+
+    @property
+    def costs(self):
+        return self._costs[:self._count]
+
+    @property
+    def goal(self):
+        return self._goal
+
+    def add_vertex(self, x_new, parent, u, cost=0.0):
+        i = super().add_vertex(x_new, parent, u)
+        if len(self._costs) < len(self._vertices):
+            self._costs = np.concatenate((self._costs, np.zeros(len(self._vertices) - len(self._costs))))
+        self._costs[i] = cost
+        self._children.append([])
+        if parent >= 0:
+            self._children[parent].append(i)
+        return i
+
+    def near(self, point, radius):
+        """
+        Returns the indices of all vertices within `radius` of the point.
+        """
+        if self._index is None or self.stale():
+            self.reindex()
+        point = np.asarray(point, dtype=np.float64)[:2]
+        near = self._index.query_radius(point[np.newaxis], radius)[0]
+        tail = self._vertices[self._indexed:self._count, :2]
+        close = np.flatnonzero(np.hypot(*(tail - point).T) <= radius) + self._indexed
+        return np.concatenate((near, close)).astype(np.int64)
+
+    def rewire(self, i, parent, u, cost):
+        """
+        Makes `parent` the parent of vertex `i` at the new `cost` and
+        updates the costs of all descendants of `i`.
+        """
+        self._children[self._parents[i]].remove(i)
+        self._children[parent].append(i)
+        self._parents[i] = parent
+        self._inputs[i] = u
+        delta = cost - self._costs[i]
+        stack = [i]
+        while stack:
+            j = stack.pop()
+            self._costs[j] += delta
+            stack.extend(self._children[j])
+
+    def check_goal(self, grid, i):
+        """
+        Remembers vertex `i` as a solution if it sees the goal from
+        within `goal_radius`.
+        """
+        d = np.hypot(*(self._goal[:2] - self._vertices[i, :2]))
+        if d <= self._goal_radius and free_segments(grid, self._vertices[i, :2], self._goal[:2])[0]:
+            self._goal_vertices.append(i)
+
+    def best_cost(self):
+        """
+        Returns the cost of the best path to the goal, or `inf`.
+        """
+        if not self._goal_vertices:
+            return np.inf
+        goal_vertices = np.array(self._goal_vertices)
+        d = np.hypot(*(self._vertices[goal_vertices, :2] - self._goal[:2]).T)
+        return float(np.min(self._costs[goal_vertices] + d))
+
+    def solution(self):
+        """
+        Returns the best path from the root to the goal and its cost,
+        or an empty path with a cost of `inf`.
+        """
+        if not self._goal_vertices:
+            return [], np.inf
+        goal_vertices = np.array(self._goal_vertices)
+        total = self._costs[goal_vertices] + np.hypot(*(self._vertices[goal_vertices, :2] - self._goal[:2]).T)
+        best = int(np.argmin(total))
+        return self.path(int(goal_vertices[best])) + [tuple(self._goal)], float(total[best])
+
+
+def sample_informed(grid, n, x_init, x_goal, c_best, rng=np.random):
+    """
+    Draws `n` free samples uniformly from the ellipse of all points whose
+    distance to `x_init` plus their distance to `x_goal` is below
+    `c_best`, the only points that can still shorten the current path.
+    """
+    x_init = np.asarray(x_init, dtype=np.float64)[:2]
+    x_goal = np.asarray(x_goal, dtype=np.float64)[:2]
+    c_min = np.hypot(*(x_goal - x_init))
+    center = (x_init + x_goal) / 2
+    angle = np.arctan2(*(x_goal - x_init)[::-1])
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    axes = np.array([c_best / 2, np.sqrt(max(c_best ** 2 - c_min ** 2, 0.0)) / 2])
+
+    samples = np.empty((0, 2))
+    while len(samples) < n:
+        batch = 2 * (n - len(samples)) + 16
+        # uniform samples of the unit disk, stretched onto the ellipse
+        r = np.sqrt(rng.uniform(0, 1, batch))
+        phi = rng.uniform(0, 2 * np.pi, batch)
+        disk = np.column_stack((r * np.cos(phi), r * np.sin(phi)))
+        states = center + (disk * axes) @ rotation.T
+        samples = np.concatenate((samples, states[free_states(grid, states)]))
+    return samples[:n]
+
+
+def generate_RRT_star(grid, x_init, x_goal, num_vertices, dt, goal_radius=1.0,
+                      informed=True, gamma=None, batch_size=128, rng=np.random):
+    """
+    Grows an RRT* from `x_init` towards `x_goal` over `num_vertices`
+    samples, using the notebook's model: the input is the heading from
+    the nearest vertex to the sample and the new state lies at most `dt`
+    along it.
+
+    New vertices pick the cheapest collision free parent among the
+    vertices within `gamma * sqrt(log(n) / n)` and then rewire those
+    neighbours through themselves; all candidate edges of a vertex are
+    checked against the grid in one batch. With `informed` set, samples
+    are drawn from the ellipse that can still improve the best path once
+    a path has been found.
+    """
+    rrt = RRTStar(x_init, x_goal, goal_radius, capacity=num_vertices + 1)
+    n, m = grid.shape[:2]
+    if gamma is None:
+        # 2 * (1 + 1/d)^(1/d) * (free area / unit ball)^(1/d) for d = 2
+        gamma = 2 * np.sqrt(1.5) * np.sqrt(np.count_nonzero(grid == 0) / np.pi)
+
+    for start in range(0, num_vertices, batch_size):
+        size = min(batch_size, num_vertices - start)
+        c_best = rrt.best_cost()
+        if informed and np.isfinite(c_best):
+            x_rand = sample_informed(grid, size, x_init, x_goal, c_best, rng)
+        else:
+            x_rand = sample_states(grid, size, rng)
+        dist, ind = rrt.nearest_distances(x_rand)
+        since = len(rrt)
+
+        for x, d, i in zip(x_rand, dist.tolist(), ind.tolist()):
+            d, near = rrt.refine_nearest(x, d, i, since)
+            x_near = rrt.vertices[near].tolist()
+            u = math.atan2(x[1] - x_near[1], x[0] - x_near[0])
+            step = min(dt, d)
+            x_new = np.array((x_near[0] + math.cos(u) * step, x_near[1] + math.sin(u) * step))
+            if not (0 <= x_new[0] < n and 0 <= x_new[1] < m and grid[int(x_new[0]), int(x_new[1])] == 0):
+                continue
+
+            count = len(rrt)
+            radius = max(gamma * math.sqrt(math.log(count + 1) / (count + 1)), step)
+            neighbours = rrt.near(x_new, radius)
+            positions = rrt.vertices[neighbours, :2]
+            lengths = np.hypot(*(positions - x_new).T)
+            free = free_segments(grid, positions, np.broadcast_to(x_new, positions.shape))
+            if not free.any():
+                continue
+            neighbours, positions, lengths = neighbours[free], positions[free], lengths[free]
+
+            # connect through the cheapest neighbour ...
+            costs = rrt.costs[neighbours] + lengths
+            best = int(np.argmin(costs))
+            parent = int(neighbours[best])
+            p = positions[best]
+            new = rrt.add_vertex(x_new, parent, math.atan2(x_new[1] - p[1], x_new[0] - p[0]), costs[best])
+
+            # ... and route the neighbours through the new vertex if cheaper
+            new_cost = costs[best]
+            for j in np.flatnonzero(new_cost + lengths < rrt.costs[neighbours]).tolist():
+                # earlier rewires may have lowered this neighbour's cost
+                if not new_cost + lengths[j] < rrt.costs[neighbours[j]]:
+                    continue
+                q = positions[j]
+                rrt.rewire(int(neighbours[j]), new, math.atan2(q[1] - x_new[1], q[0] - x_new[0]),
+                           new_cost + lengths[j])
+            rrt.check_goal(grid, new)
+
+    return rrt
@@ -0,0 +1,99 @@
+import numpy as np
+from scipy.ndimage import distance_transform_edt
+
+
+class ClearanceMap:
+    """
+    Precomputed Euclidean distance from every cell of a grid to the
+    nearest obstacle cell, along with the index of that obstacle.
+
+    Built once from the grid in O(cells); any query afterwards is a
+    single array lookup.
+    """
+
+    def __init__(self, grid):
+        obstacles = np.asarray(grid) == 1
+        self._shape = obstacles.shape
+        if obstacles.any():
+            self._distance, self._nearest = distance_transform_edt(~obstacles, return_indices=True)
+        else:
+            # without obstacles there is nothing to keep clear of
+            self._distance = np.full(obstacles.shape, np.inf)
+            self._nearest = np.full((2,) + obstacles.shape, -1)
+
+    @property
+    def distance(self):
+        """Distance from each cell to the nearest obstacle cell."""
+        return self._distance
+
+    @property
+    def nearest(self):
+        """Indices of the nearest obstacle cell, shaped `(2, north, east)`."""
+        return self._nearest
+
+    def cells(self, points):
+        """
+        Returns the indices of the cells containing the given points
+        along with a mask of the points that lie on the grid.
+        """
+        points = np.floor(np.asarray(points, dtype=np.float64)).astype(int)
+        inside = np.all((points >= 0) & (points < self._shape), axis=-1)
+        cells = np.where(inside[..., np.newaxis], points, 0)
+        return (cells[..., 0], cells[..., 1]), inside
+
+    def clearance(self, points):
+        """
+        Returns the clearance at one or more points in grid coordinates.
+        Points off the grid have no clearance.
+        """
+        cells, inside = self.cells(points)
+        return np.where(inside, self._distance[cells], 0.0)
+
+    def nearest_obstacle(self, points):
+        """
+        Returns the index of the obstacle cell nearest to one or more points
+        in grid coordinates, or `-1` for points off the grid.
+        """
+        cells, inside = self.cells(points)
+        nearest = np.stack((self._nearest[0][cells], self._nearest[1][cells]), axis=-1)
+        return np.where(inside[..., np.newaxis], nearest, -1)
+
+
+def attraction_field(shape, goal, alpha):
+    """
+    Returns the attractive gradient `alpha * (position - goal)` for
+    every cell of a grid, shaped `(2, north, east)`.
+    """
+    positions = np.indices(shape, dtype=np.float64)
+    return alpha * (positions - np.asarray(goal, dtype=np.float64).reshape(2, 1, 1))
+
+
+def repulsion_field(clearance_map, beta, q_max):
+    """
+    Returns the repulsive gradient for every cell of a grid, shaped
+    `(2, north, east)`, using the nearest obstacle of each cell.
+
+    Cells further than `q_max` from any obstacle, as well as obstacle
+    cells themselves, are not repelled.
+    """
+    distance = clearance_map.distance
+    positions = np.indices(distance.shape, dtype=np.float64)
+    active = (distance > 0) & (distance < q_max)
+
+    d = np.where(active, distance, 1.0)
+    magnitude = np.where(active, beta * ((1 / q_max) - (1 / d)) * (1 / d**2), 0.0)
+    return magnitude * (positions - clearance_map.nearest) / d
+
+
+def potential_field(grid, goal, alpha, beta, q_max):
+    """
+    Vectorized potential field over all free cells of the grid.
+
+    Returns the cell coordinates `x, y` and the field components
+    `fx, fy` as flat arrays, in the same order as iterating over the
+    free cells row by row.
+    """
+    grid = np.asarray(grid)
+    field = attraction_field(grid.shape, goal, alpha) + repulsion_field(ClearanceMap(grid), beta, q_max)
+    x, y = np.nonzero(grid == 0)
+    return x, y, field[0][x, y], field[1][x, y]
@@ -0,0 +1,151 @@
+import numpy as np
+
+from steering import MAX_STEERING_ANGLE
+
+WORDS = ('LSL', 'RSR', 'LSR', 'RSL', 'RLR', 'LRL')
+# turn direction of every segment: 1 left, 0 straight, -1 right
+KINDS = np.array([[{'L': 1, 'S': 0, 'R': -1}[c] for c in word] for word in WORDS], dtype=np.int64)
+
+
+def turning_radius(max_steer=MAX_STEERING_ANGLE):
+    """
+    Smallest turning radius of the `simulate` model, which turns at
+    `v * tan(angle)` radians per unit of time.
+    """
+    return 1 / np.tan(max_steer)
+
+
+def mod2pi(angle):
+    return np.mod(angle, 2 * np.pi)
+
+
+def dubins_words(starts, goals, rho):
+    """
+    Solves all six Dubins words in closed form for N pairs of
+    `[x, y, theta]` states at once.
+
+    Returns the segment lengths shaped `(N, 6, 3)`, in the order of
+    `WORDS` and in the same units as the states; words without a
+    solution have infinite lengths.
+    """
+    starts = np.asarray(starts, dtype=np.float64).reshape(-1, 3)
+    goals = np.asarray(goals, dtype=np.float64).reshape(-1, 3)
+    dx, dy = (goals[:, :2] - starts[:, :2]).T
+    d = np.hypot(dx, dy) / rho
+    theta = mod2pi(np.arctan2(dy, dx))
+    a = mod2pi(starts[:, 2] - theta)
+    b = mod2pi(goals[:, 2] - theta)
+    sa, sb, ca, cb = np.sin(a), np.sin(b), np.cos(a), np.cos(b)
+    c_ab = np.cos(a - b)
+
+    t = np.full((len(d), 6), np.nan)
+    p = np.full((len(d), 6), np.nan)
+    q = np.full((len(d), 6), np.nan)
+
+    with np.errstate(invalid='ignore'):
+        # LSL
+        p2 = 2 + d * d - 2 * c_ab + 2 * d * (sa - sb)
+        tmp = np.arctan2(cb - ca, d + sa - sb)
+        t[:, 0], p[:, 0], q[:, 0] = mod2pi(-a + tmp), np.sqrt(p2), mod2pi(b - tmp)
+        # RSR
+        p2 = 2 + d * d - 2 * c_ab + 2 * d * (sb - sa)
+        tmp = np.arctan2(ca - cb, d - sa + sb)
+        t[:, 1], p[:, 1], q[:, 1] = mod2pi(a - tmp), np.sqrt(p2), mod2pi(-b + tmp)
+        # LSR
+        p2 = -2 + d * d + 2 * c_ab + 2 * d * (sa + sb)
+        p[:, 2] = np.sqrt(p2)
+        tmp = np.arctan2(-ca - cb, d + sa + sb) - np.arctan2(-2.0, p[:, 2])
+        t[:, 2], q[:, 2] = mod2pi(-a + tmp), mod2pi(-b + tmp)
+        # RSL
+        p2 = -2 + d * d + 2 * c_ab - 2 * d * (sa + sb)
+        p[:, 3] = np.sqrt(p2)
+        tmp = np.arctan2(ca + cb, d - sa - sb) - np.arctan2(2.0, p[:, 3])
+        t[:, 3], q[:, 3] = mod2pi(a - tmp), mod2pi(b - tmp)
+        # RLR
+        tmp = (6 - d * d + 2 * c_ab + 2 * d * (sa - sb)) / 8
+        p[:, 4] = mod2pi(2 * np.pi - np.arccos(tmp))
+        t[:, 4] = mod2pi(a - np.arctan2(ca - cb, d - sa + sb) + p[:, 4] / 2)
+        q[:, 4] = mod2pi(a - b - t[:, 4] + p[:, 4])
+        # LRL
+        tmp = (6 - d * d + 2 * c_ab + 2 * d * (sb - sa)) / 8
+        p[:, 5] = mod2pi(2 * np.pi - np.arccos(tmp))
+        t[:, 5] = mod2pi(-a - np.arctan2(ca - cb, d + sa - sb) + p[:, 5] / 2)
+        q[:, 5] = mod2pi(b - a - t[:, 5] + p[:, 5])
+
+    lengths = np.stack((t, p, q), axis=-1) * rho
+    return np.where(np.isnan(lengths).any(axis=-1, keepdims=True), np.inf, lengths)
+
+
+def dubins_shortest(starts, goals, rho):
+    """
+    Returns the index into `WORDS` of the shortest Dubins path between
+    each pair of states, its three segment lengths and its total length.
+    """
+    lengths = dubins_words(starts, goals, rho)
+    total = lengths.sum(axis=-1)
+    words = np.argmin(total, axis=1)
+    rows = np.arange(len(words))
+    return words, lengths[rows, words], total[rows, words]
+
+
+def advance(states, kinds, s, rho):
+    """
+    Moves `[x, y, theta]` states a distance `s` along a left (1),
+    straight (0) or right (-1) segment of radius `rho`, all broadcast.
+    """
+    states = np.asarray(states, dtype=np.float64)
+    x, y, theta = states[..., 0], states[..., 1], states[..., 2]
+    k = kinds / rho
+    turn = k != 0
+    safe_k = np.where(turn, k, 1.0)
+    new_theta = theta + k * s
+    nx = np.where(turn, x + (np.sin(new_theta) - np.sin(theta)) / safe_k, x + s * np.cos(theta))
+    ny = np.where(turn, y - (np.cos(new_theta) - np.cos(theta)) / safe_k, y + s * np.sin(theta))
+    return np.stack((nx, ny, new_theta), axis=-1)
+
+
+def sample_dubins(starts, words, lengths, rho, step=0.5):
+    """
+    Samples the Dubins paths given by `dubins_shortest` every `step`
+    along their length, end points included.
+
+    Returns the `[x, y, theta]` samples of all paths concatenated,
+    along with the index of the path every sample belongs to.
+    """
+    starts = np.asarray(starts, dtype=np.float64).reshape(-1, 3)
+    kinds = KINDS[words]
+    # states at the start of each segment
+    corners = [starts]
+    for i in range(3):
+        corners.append(advance(corners[-1], kinds[:, i], lengths[:, i], rho))
+    corners = np.stack(corners[:3], axis=1)
+
+    total = lengths.sum(axis=1)
+    counts = np.ceil(total / step).astype(np.int64) + 1
+    path = np.repeat(np.arange(len(starts)), counts)
+    k = np.arange(path.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    s = np.minimum(k * step, total[path])
+
+    # the segment every sample falls on and the distance into it
+    ends = np.cumsum(lengths, axis=1)
+    segment = np.minimum((s[:, np.newaxis] > ends[path]).sum(axis=1), 2)
+    offset = s - np.concatenate((np.zeros((len(starts), 1)), ends[:, :2]), axis=1)[path, segment]
+    samples = advance(corners[path, segment], kinds[path, segment], offset, rho)
+    samples[:, 2] = mod2pi(samples[:, 2])
+    return samples, path
+
+
+def dubins_free(grid, starts, goals, rho, step=0.5):
+    """
+    Returns a mask of the pairs of states whose shortest Dubins path
+    stays on the grid and only crosses free cells, along with the path
+    lengths. All pairs are solved and checked at once.
+    """
+    words, lengths, total = dubins_shortest(starts, goals, rho)
+    samples, path = sample_dubins(starts, words, lengths, rho, step)
+    cells = np.floor(samples[:, :2]).astype(np.int64)
+    inside = np.all((cells >= 0) & (cells < grid.shape[:2]), axis=1)
+    blocked = ~inside
+    blocked[inside] = grid[cells[inside, 0], cells[inside, 1]] == 1
+    free = np.bincount(path, weights=blocked, minlength=len(total)) == 0
+    return free, total
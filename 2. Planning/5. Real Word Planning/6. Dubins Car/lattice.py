@@ -0,0 +1,233 @@
+import heapq
+import os
+import tempfile
+import numpy as np
+
+from steering import MAX_STEERING_ANGLE, rollout
+
+
+def primitive_cache_name(v, dt, max_steer, num_headings, num_angles, steps):
+    # the exact float values, so nearby parameter sets never share a file
+    return 'primitives_v{!r}_dt{!r}_steer{!r}_h{}_a{}_s{}.npz'.format(
+        float(v), float(dt), float(max_steer), int(num_headings), int(num_angles), int(steps))
+
+
+def build_primitives(v, dt, max_steer=MAX_STEERING_ANGLE, num_headings=16, num_angles=5, steps=10):
+    """
+    Builds the motion primitive library of the Dubins car.
+
+    For each of the `num_headings` discrete headings, `num_angles`
+    steering angles in `[-max_steer, max_steer]` are held for `steps`
+    steps of `dt` with the notebook's `simulate` model, starting from the
+    center of a cell. End states are snapped to the nearest cell center
+    and discrete heading. Every primitive stores the cell offset and
+    heading it ends in, its cost, the steering angle and the offsets of
+    all cells it sweeps through, the latter in CSR form.
+    """
+    headings = np.arange(num_headings) * 2 * np.pi / num_headings
+    angles = np.linspace(-max_steer, max_steer, num_angles)
+    starts = np.column_stack((np.full(num_headings, 0.5), np.full(num_headings, 0.5), headings))
+    trajectories = rollout(starts, angles, v, dt, steps)
+
+    ends = trajectories[:, :, -1]
+    end_cells = np.floor(ends[..., :2]).astype(np.int64)
+    end_headings = np.round(ends[..., 2] / (2 * np.pi) * num_headings).astype(np.int64) % num_headings
+    # never cheaper than the straight line between the snapped cells,
+    # so the Euclidean distance stays an admissible heuristic
+    cost = np.maximum(v * dt * steps, np.hypot(end_cells[..., 0], end_cells[..., 1]))
+
+    heading, angle, end, end_heading, costs, swept = [], [], [], [], [], []
+    for h in range(num_headings):
+        seen = {}
+        for a in range(num_angles):
+            key = (end_cells[h, a, 0], end_cells[h, a, 1], end_headings[h, a])
+            if key == (0, 0, h) or (key in seen and cost[h, seen[key]] <= cost[h, a]):
+                continue
+            seen[key] = a
+        for a in sorted(seen.values()):
+            # cells under the straight segments between the rollout
+            # points, sampled at a quarter of a cell
+            points = trajectories[h, a, :, :2]
+            lengths = np.hypot(*np.diff(points, axis=0).T)
+            counts = np.ceil(lengths / 0.25).astype(np.int64) + 1
+            t = np.concatenate([np.linspace(0, 1, c) for c in counts])
+            seg = np.repeat(np.arange(len(counts)), counts)
+            samples = points[seg] + t[:, np.newaxis] * (points[seg + 1] - points[seg])
+            cells = np.vstack((np.floor(samples).astype(np.int64), end_cells[h, a]))
+
+            heading.append(h)
+            angle.append(angles[a])
+            end.append(end_cells[h, a])
+            end_heading.append(end_headings[h, a])
+            costs.append(cost[h, a])
+            swept.append(np.unique(cells, axis=0))
+
+    counts = np.array([len(s) for s in swept], dtype=np.int64)
+    return {
+        'heading': np.array(heading, dtype=np.int64),
+        'angle': np.array(angle, dtype=np.float64),
+        'end': np.array(end, dtype=np.int64).reshape(-1, 2),
+        'end_heading': np.array(end_heading, dtype=np.int64),
+        'cost': np.array(costs, dtype=np.float64),
+        'swept_indptr': np.concatenate(([0], np.cumsum(counts))),
+        'swept': np.vstack(swept),
+        'num_headings': np.int64(num_headings),
+    }
+
+
+def load_primitives(v, dt, max_steer=MAX_STEERING_ANGLE, num_headings=16, num_angles=5, steps=10,
+                    cache_dir='.cache'):
+    """
+    Returns the primitive library for `(v, dt, max_steer)`, building it
+    once and caching it as an `.npz` file in `cache_dir`.
+    """
+    filename = os.path.join(cache_dir, primitive_cache_name(v, dt, max_steer, num_headings, num_angles, steps))
+    if os.path.exists(filename):
+        with np.load(filename) as data:
+            return {k: data[k] for k in data.files}
+
+    primitives = build_primitives(v, dt, max_steer, num_headings, num_angles, steps)
+    os.makedirs(cache_dir, exist_ok=True)
+    # a unique temporary file, so concurrent builds never overwrite each other
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **primitives)
+        os.replace(tmp, filename)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return primitives
+
+
+class LatticePlanner:
+    """
+    A* over `(x, y, heading)` lattice states of a grid, connected by a
+    precomputed Dubins car primitive library.
+
+    The grid is padded with obstacles as wide as the largest primitive,
+    and all offsets are turned into flat indices once per grid, so
+    checking every primitive leaving a state is one array lookup.
+    """
+
+    def __init__(self, primitives):
+        self._p = primitives
+        self._num_headings = int(primitives['num_headings'])
+        order = np.argsort(primitives['heading'], kind='stable')
+        if not np.array_equal(order, np.arange(len(order))):
+            raise ValueError('primitives must be sorted by heading')
+        self._first = np.searchsorted(primitives['heading'], np.arange(self._num_headings + 1))
+        self._pad = int(np.abs(primitives['swept']).max()) + 1
+
+    @property
+    def primitives(self):
+        return self._p
+
+    def to_state(self, cell, h):
+        """
+        Returns the continuous `[x, y, theta]` state of a lattice node.
+        """
+        return (cell[0] + 0.5, cell[1] + 0.5, h * 2 * np.pi / self._num_headings)
+
+    def to_node(self, state):
+        """
+        Snaps a continuous `[x, y, theta]` state to its lattice node.
+        """
+        h = int(np.round(state[2] / (2 * np.pi) * self._num_headings)) % self._num_headings
+        return (int(np.floor(state[0])), int(np.floor(state[1]))), h
+
+    def plan(self, grid, start, goal):
+        """
+        Finds a path from the `[x, y, theta]` start to the goal cell.
+        A goal with a third entry also has to be reached with that heading.
+
+        Returns the lattice states along the path, the steering angles of
+        the primitives between them and the cost of the path.
+        """
+        p = self._p
+        H = self._num_headings
+        pad = self._pad
+        width = grid.shape[1] + 2 * pad
+        blocked = np.ones((grid.shape[0] + 2 * pad, width), dtype=np.bool_)
+        blocked[pad:-pad, pad:-pad] = grid == 1
+        blocked = blocked.ravel()
+
+        end_offsets = (p['end'][:, 0] * width + p['end'][:, 1]).tolist()
+        end_headings = p['end_heading'].tolist()
+        costs = p['cost'].tolist()
+        swept = p['swept'][:, 0] * width + p['swept'][:, 1]
+        indptr = p['swept_indptr']
+        # the swept cells of all primitives of one heading, one segment each
+        per_heading = []
+        for h in range(H):
+            lo, hi = self._first[h], self._first[h + 1]
+            per_heading.append((
+                list(range(lo, hi)),
+                swept[indptr[lo]:indptr[hi]],
+                indptr[lo:hi] - indptr[lo],
+            ))
+
+        (si, sj), sh = self.to_node(start)
+        gi, gj = int(np.floor(goal[0])), int(np.floor(goal[1]))
+        goal_heading = self.to_node(goal)[1] if len(goal) > 2 else None
+        start_cell = (si + pad) * width + sj + pad
+        goal_cell = (gi + pad) * width + gj + pad
+
+        def h_cost(cell):
+            return np.hypot(cell // width - gi - pad, cell % width - gj - pad)
+
+        g = {}
+        parent = {}
+        start_id = start_cell * H + sh
+        g[start_id] = 0.0
+        closed = set()
+        queue = [(h_cost(start_cell), start_id)]
+        found = None
+
+        while queue:
+            _, current = heapq.heappop(queue)
+            if current in closed:
+                continue
+            closed.add(current)
+            cell, h = divmod(current, H)
+            if cell == goal_cell and (goal_heading is None or h == goal_heading):
+                print('Found a path.')
+                found = current
+                break
+
+            indices, cells, starts = per_heading[h]
+            if not indices:
+                continue
+            hit = np.logical_or.reduceat(blocked[cell + cells], starts).tolist()
+            current_cost = g[current]
+            for k, i in enumerate(indices):
+                if hit[k]:
+                    continue
+                next_cell = cell + end_offsets[i]
+                next_id = next_cell * H + end_headings[i]
+                if next_id in closed:
+                    continue
+                branch_cost = current_cost + costs[i]
+                if branch_cost < g.get(next_id, np.inf):
+                    g[next_id] = branch_cost
+                    parent[next_id] = (current, i)
+                    heapq.heappush(queue, (branch_cost + h_cost(next_cell), next_id))
+
+        path = []
+        controls = []
+        path_cost = 0
+        if found is not None:
+            # retrace steps
+            path_cost = g[found]
+            n = found
+            while n != start_id:
+                cell, h = divmod(n, H)
+                path.append(self.to_state((cell // width - pad, cell % width - pad), h))
+                n, i = parent[n]
+                controls.append(float(p['angle'][i]))
+            path.append(self.to_state((si, sj), sh))
+        else:
+            print('**********************')
+            print('Failed to find a path!')
+            print('**********************')
+        return path[::-1], controls[::-1], path_cost
@@ -0,0 +1,75 @@
+import numpy as np
+
+# limit the steering angle range
+MAX_STEERING_ANGLE = np.deg2rad(30)
+# Set the width of the Gaussian we'll draw angles from
+ANGLE_STDDEV = np.deg2rad(3)
+
+
+def simulate(state, angle, v, dt):
+    """
+    The Dubins car model of the notebooks, vectorized.
+
+    `state` is an array of `[x, y, theta]` along its last axis and
+    `angle` and `v` broadcast against the remaining axes, e.g. N states
+    shaped `(N, 1, 3)` and M steering angles shaped `(M,)` give all
+    `(N, M, 3)` next states in one call.
+    """
+    state = np.asarray(state, dtype=np.float64)
+    x, y, theta = state[..., 0], state[..., 1], state[..., 2]
+
+    nx = x + v * np.cos(theta) * dt
+    ny = y + v * np.sin(theta) * dt
+    ntheta = theta + v * np.tan(angle) * dt
+
+    return np.stack(np.broadcast_arrays(nx, ny, ntheta), axis=-1)
+
+
+def rollout(states, angles, v, dt, steps):
+    """
+    Holds each of the M steering `angles` for `steps` steps from each of
+    the N `states`. Returns the trajectories shaped `(N, M, steps + 1, 3)`,
+    starting with the initial states.
+    """
+    states = np.asarray(states, dtype=np.float64).reshape(-1, 3)
+    angles = np.asarray(angles, dtype=np.float64).ravel()
+    trajectories = np.empty((len(states), len(angles), steps + 1, 3))
+    trajectories[:, :, 0] = states[:, np.newaxis]
+    for k in range(steps):
+        trajectories[:, :, k + 1] = simulate(trajectories[:, :, k], angles, v, dt)
+    return trajectories
+
+
+def steer(x1, x2, n=1, rng=np.random):
+    """
+    Draws `n` steering angles roughly towards `x2` from `x1`, like the
+    notebook's `steer`, for one or many `x1`/`x2` pairs at once.
+    Returns an array shaped `(..., n)`.
+    """
+    x1 = np.asarray(x1, dtype=np.float64)
+    x2 = np.asarray(x2, dtype=np.float64)
+    # angle difference between the direction toward x2
+    # and our current orientation
+    angle = np.arctan2(x2[..., 1] - x1[..., 1], x2[..., 0] - x1[..., 0]) - x1[..., 2]
+    angle = rng.normal(angle[..., np.newaxis], ANGLE_STDDEV, size=np.shape(angle) + (n,))
+    return np.clip(angle, -MAX_STEERING_ANGLE, MAX_STEERING_ANGLE)
+
+
+def best_control(state, target, angles, v, dt, steps, valid=None):
+    """
+    Rolls out all candidate steering `angles` from `state` in one call
+    and picks the one whose end point gets closest to `target`.
+
+    `valid` optionally maps the `(M, steps + 1, 3)` trajectories to a
+    mask of the admissible ones, e.g. those free of collisions.
+    Returns the index of the chosen angle and its trajectory, or
+    `(None, None)` if no candidate is admissible.
+    """
+    trajectories = rollout(state, angles, v, dt, steps)[0]
+    d = np.hypot(*(trajectories[:, -1, :2] - np.asarray(target, dtype=np.float64)[:2]).T)
+    if valid is not None:
+        d = np.where(valid(trajectories), d, np.inf)
+    i = int(np.argmin(d))
+    if not np.isfinite(d[i]):
+        return None, None
+    return i, trajectories[i]
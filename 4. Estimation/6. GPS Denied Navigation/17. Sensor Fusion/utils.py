@@ -1,5 +1,22 @@
 import numpy as np
 
+def obstacle_mask(shape, north_lo, north_hi, east_lo, east_hi):
+    """
+    Returns a boolean mask of the given shape marking every cell that is
+    covered by at least one of the inclusive index boxes
+    `[north_lo, north_hi] x [east_lo, east_hi]`.
+
+    Instead of slicing each box into the grid, the four corners of all
+    boxes are scattered into a difference array at once; its 2D prefix
+    sum counts the boxes covering each cell.
+    """
+    corners = np.zeros((shape[0] + 1, shape[1] + 1), dtype=np.int64)
+    np.add.at(corners, (north_lo, east_lo), 1)
+    np.add.at(corners, (north_lo, east_hi + 1), -1)
+    np.add.at(corners, (north_hi + 1, east_lo), -1)
+    np.add.at(corners, (north_hi + 1, east_hi + 1), 1)
+    return corners.cumsum(axis=0).cumsum(axis=1)[:-1, :-1] > 0
+
 def create_grid(data):
     """
     Returns a grid representation of a 2D configuration space
@@ -24,15 +41,14 @@ def create_grid(data):
     grid = np.zeros((north_size, east_size))
 
     # Populate the grid with obstacles
-    for i in range(data.shape[0]):
-        north, east, alt, d_north, d_east, d_alt = data[i, :]
-        obstacle = [
-            int(np.clip(north - d_north - north_min, 0, north_size-1)),
-            int(np.clip(north + d_north - north_min, 0, north_size-1)),
-            int(np.clip(east - d_east - east_min, 0, east_size-1)),
-            int(np.clip(east + d_east - east_min, 0, east_size-1)),
-        ]
-        grid[obstacle[0]:obstacle[1]+1, obstacle[2]:obstacle[3]+1] = 1
+    north, east, alt, d_north, d_east, d_alt = data.T
+    grid[obstacle_mask(
+        grid.shape,
+        np.clip(north - d_north - north_min, 0, north_size-1).astype(int),
+        np.clip(north + d_north - north_min, 0, north_size-1).astype(int),
+        np.clip(east - d_east - east_min, 0, east_size-1).astype(int),
+        np.clip(east + d_east - east_min, 0, east_size-1).astype(int),
+    )] = 1
 
     return grid, int(north_min), int(east_min)
 